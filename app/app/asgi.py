@@ -13,4 +13,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up as they rely on models and settings.
+from core import last_seen  # noqa: E402
+from monitor.stream import STREAM_PATH, SampleStreamApp  # noqa: E402
+
+# Write the last login and activity times buffered by the workers.
+last_seen.buffer.start()
+
+stream_application = SampleStreamApp()
+
+
+async def application(scope, receive, send):
+    """Route the sample stream to its ASGI app and everything else to Django."""
+    if scope["type"] == "http" and scope["path"] == STREAM_PATH:
+        await stream_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
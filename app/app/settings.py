@@ -21,12 +21,18 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = "django-insecure-3v@%kw72l%+)v6j)-q+fb85*i15e#tov$5oc1&e$o1i_x#&e(-"
+SECRET_KEY = os.environ.get(
+    "SECRET_KEY", "django-insecure-3v@%kw72l%+)v6j)-q+fb85*i15e#tov$5oc1&e$o1i_x#&e(-"
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Besides leaking internals in error pages, debug mode keeps every executed
+# query in memory for the duration of each request.
+DEBUG = bool(int(os.environ.get("DEBUG", 1)))
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get("ALLOWED_HOSTS", "").split(",") if host
+]
 
 
 # Application definition
@@ -43,9 +49,14 @@ INSTALLED_APPS = [
     "rest_framework.authtoken",
     "drf_spectacular",
     "user",
+    "monitor",
 ]
 
 MIDDLEWARE = [
+    # Must come first (see `core.sharding`).
+    "core.sharding.ShardMiddleware",
+    # Only used when `TRAFFIC_CAPTURE_PATH` is set.
+    "core.capture.TrafficCaptureMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -90,6 +101,34 @@ DATABASES = {
 }
 
 
+# User-based sharding (see `core.sharding`). Every shard is a database alias
+# holding a subset of the users and their data, and "default" also holds the
+# global directory of users. Extra shards are listed in `DB_SHARDS` and
+# reach the server of "default" unless `DB_<SHARD>_HOST` and
+# `DB_<SHARD>_NAME` say otherwise.
+def shard_database(alias: str) -> dict:
+    prefix: str = f"DB_{alias.upper()}"
+    return {
+        **DATABASES["default"],
+        "HOST": os.environ.get(f"{prefix}_HOST", DATABASES["default"]["HOST"]),
+        "NAME": os.environ.get(
+            f"{prefix}_NAME", f"{DATABASES['default']['NAME']}_{alias}"
+        ),
+    }
+
+
+SHARDS = ["default"] + [
+    alias for alias in os.environ.get("DB_SHARDS", "").split(",") if alias
+]
+for alias in SHARDS[1:]:
+    DATABASES[alias] = shard_database(alias)
+
+DATABASE_ROUTERS = ["core.sharding.ShardRouter"]
+
+# Seconds during which the shard of a user is cached by each process.
+SHARD_CACHE_TIMEOUT = int(os.environ.get("SHARD_CACHE_TIMEOUT", 60))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -136,5 +175,90 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Specify our custom user model as the authentication model.
 AUTH_USER_MODEL = "core.User"
 
+# Users are looked up on their shard.
+AUTHENTICATION_BACKENDS = ["core.authentication.ShardedModelBackend"]
+
 # Specify the framework to use for generating schema.
 REST_FRAMEWORK = {"DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema"}
+
+# Real-time sample stream (see `monitor.stream`).
+# Maximum number of frames buffered per connection before the oldest ones
+# are dropped for a slow client.
+MONITOR_STREAM_BUFFER_SIZE = int(os.environ.get("MONITOR_STREAM_BUFFER_SIZE", 256))
+# Maximum number of concurrent stream connections per worker process.
+MONITOR_STREAM_MAX_CONNECTIONS = int(
+    os.environ.get("MONITOR_STREAM_MAX_CONNECTIONS", 1000)
+)
+# Seconds between keepalive comments on an idle stream.
+MONITOR_STREAM_HEARTBEAT = float(os.environ.get("MONITOR_STREAM_HEARTBEAT", 15))
+
+# Number of background threads sending alert notifications.
+ALERT_NOTIFICATION_WORKERS = int(os.environ.get("ALERT_NOTIFICATION_WORKERS", 2))
+
+# Seconds between two writes of the last login and activity times buffered
+# by each worker (see `core.last_seen`). It is how stale they may be in the
+# admin, and how much of them a crashing worker may lose.
+LAST_SEEN_FLUSH_INTERVAL = float(os.environ.get("LAST_SEEN_FLUSH_INTERVAL", 10))
+
+# Partitioning and retention of samples (see `core.partitions`).
+# Number of monthly partitions created ahead of the current month.
+SAMPLE_PARTITIONS_AHEAD = int(os.environ.get("SAMPLE_PARTITIONS_AHEAD", 3))
+# Number of days of samples to keep; unset keeps every sample.
+SAMPLE_RETENTION_DAYS = (
+    int(os.environ["SAMPLE_RETENTION_DAYS"])
+    if os.environ.get("SAMPLE_RETENTION_DAYS")
+    else None
+)
+
+# Cold storage of old samples (see `core.cold_storage`).
+COLD_STORAGE_DIR = os.environ.get("COLD_STORAGE_DIR", str(BASE_DIR / "data" / "cold"))
+# Age in days after which monthly partitions are compacted into cold storage.
+COLD_STORAGE_AFTER_DAYS = int(os.environ.get("COLD_STORAGE_AFTER_DAYS", 90))
+
+# Pages of the sample query API (see `monitor.pagination`).
+# Number of samples per page, unless a `page_size` is requested.
+SAMPLE_LIST_PAGE_SIZE = int(os.environ.get("SAMPLE_LIST_PAGE_SIZE", 1000))
+# Largest `page_size` a caller can request.
+SAMPLE_LIST_MAX_PAGE_SIZE = int(os.environ.get("SAMPLE_LIST_MAX_PAGE_SIZE", 10000))
+
+# Operator listing of users (see `user.pagination`).
+# Number of users per page, unless a `page_size` is requested.
+USER_LIST_PAGE_SIZE = int(os.environ.get("USER_LIST_PAGE_SIZE", 100))
+# Largest `page_size` a caller can request.
+USER_LIST_MAX_PAGE_SIZE = int(os.environ.get("USER_LIST_MAX_PAGE_SIZE", 1000))
+
+# Capture of a sample of the requests for `replay_requests` (see
+# `core.capture`). Leaving `TRAFFIC_CAPTURE_PATH` unset disables it.
+TRAFFIC_CAPTURE_PATH = os.environ.get("TRAFFIC_CAPTURE_PATH") or None
+# Fraction of the requests captured.
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.environ.get("TRAFFIC_CAPTURE_SAMPLE_RATE", 0.01))
+# Largest request body captured, in bytes.
+TRAFFIC_CAPTURE_MAX_BODY = int(os.environ.get("TRAFFIC_CAPTURE_MAX_BODY", 65536))
+
+# Caches. Idempotency keys need a cache shared by every worker process,
+# hence the database cache (create its table with `createcachetable`).
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "idempotency": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "core_idempotency_cache",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 100000))
+        },
+    },
+}
+
+# Idempotency keys of POST requests (see `core.idempotency`).
+IDEMPOTENCY_CACHE = "idempotency"
+# Seconds during which a response is replayed to retries with the same key.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 3600))
+# Seconds a duplicate waits for the original request to complete.
+IDEMPOTENCY_WAIT_TIMEOUT = int(os.environ.get("IDEMPOTENCY_WAIT_TIMEOUT", 30))
+# Seconds an in-flight request holds its key, which must exceed the longest
+# request (see `GUNICORN_TIMEOUT`). Retries get 409 for that long when the
+# worker handling the original dies.
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", 300))
+
+# Multiplier of the time budgets enforced by tests (see `core.budgets`), to
+# be raised on slow machines.
+QUERY_BUDGET_TIME_FACTOR = float(os.environ.get("QUERY_BUDGET_TIME_FACTOR", 1))
@@ -0,0 +1,18 @@
+"""
+Django settings for running the tests.
+
+They add a second shard, only used by the sharding tests, which are
+skipped under the regular settings:
+
+    python manage.py test --settings=app.settings_test
+"""
+from app.settings import *  # noqa: F401,F403
+from app.settings import DATABASES
+
+DATABASES = {
+    **DATABASES,
+    "shard_test": {
+        **DATABASES["default"],
+        "TEST": {"NAME": f"test_{DATABASES['default']['NAME']}_shard_test"},
+    },
+}
@@ -29,4 +29,5 @@ urlpatterns = [
         name="api-docs",
     ),
     path("api/user/", include("user.urls")),
+    path("api/monitor/", include("monitor.urls")),
 ]
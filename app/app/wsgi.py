@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Imported after Django is set up as it relies on models and settings.
+from core import last_seen  # noqa: E402
+
+# Write the last login and activity times buffered by the workers.
+last_seen.buffer.start()
@@ -0,0 +1,76 @@
+"""
+Benchmark the incremental alert rule engine.
+
+Evaluates `--batches` ingest batches of `--batch-size` samples spread over
+`--series` series against `--rules` rules of one user and reports how many
+rule evaluations (one sample checked against one rule) run per second.
+Only the in-memory engine is measured; persisting rule state is a single
+`bulk_update` per batch.
+
+Usage (from the `app` directory):
+    python -m benchmarks.bench_alert_rules --rules 1000 --series 50
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+
+from core.models import AlertRule, Sample  # noqa: E402
+from monitor.alerts import evaluate  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--series", type=int, default=50)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    comparisons: list = [choice for choice, _ in AlertRule.COMPARISON_CHOICES]
+    rules: list = [
+        AlertRule(
+            id=i,
+            series=f"series_{i % args.series}",
+            comparison=random.choice(comparisons),
+            threshold=random.uniform(0, 100),
+            duration=timedelta(minutes=random.randint(0, 10)),
+        )
+        for i in range(args.rules)
+    ]
+
+    start: datetime = datetime(2022, 9, 1, tzinfo=timezone.utc)
+    evaluations: int = 0
+    fired: int = 0
+    elapsed: float = 0.0
+    for batch in range(args.batches):
+        samples: list = [
+            Sample(
+                series=f"series_{random.randrange(args.series)}",
+                timestamp=start + timedelta(seconds=batch * args.batch_size + i),
+                value=random.uniform(0, 100),
+            )
+            for i in range(args.batch_size)
+        ]
+        began: float = time.perf_counter()
+        result = evaluate(rules, samples)
+        elapsed += time.perf_counter() - began
+        evaluations += result.evaluations
+        fired += len(result.fired)
+
+    print(f"rules:                    {args.rules} over {args.series} series")
+    print(f"samples:                  {args.batches * args.batch_size}")
+    print(f"rule evaluations:         {evaluations}")
+    print(f"alerts fired:             {fired}")
+    print(f"rule evaluations per sec: {evaluations / elapsed:,.0f}")
+    print(f"samples per sec:          {args.batches * args.batch_size / elapsed:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
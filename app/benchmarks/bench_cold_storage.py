@@ -0,0 +1,143 @@
+"""
+Benchmark the cold storage tier against the hot PostgreSQL partition.
+
+Generates one month of samples (`--users` x `--series`, one every
+`--interval` seconds), writes them to a cold file and reports its size per
+sample and the time to read one day and one whole month of a series. On
+PostgreSQL the same samples are also loaded into a scratch partition (in a
+transaction that is rolled back) to compare size and range-scan times.
+
+Usage (from the `app` directory):
+    python -m benchmarks.bench_cold_storage --users 20 --series 3 --interval 60
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+
+from core import cold_storage, partitions  # noqa: E402
+from core.models import Sample  # noqa: E402
+
+MONTH: datetime = datetime(2099, 1, 1, tzinfo=timezone.utc)
+DAY: timedelta = timedelta(days=1)
+
+
+def generate(user_ids: list, series: int, interval: int):
+    """Yield rows sorted by user, series and timestamp."""
+    count: int = 31 * 24 * 3600 // interval
+    for user_id in user_ids:
+        for index in range(series):
+            for i in range(count):
+                # A noisy periodic signal, like a heart rate over a day.
+                value: float = round(
+                    70 + 15 * math.sin(i / 240) + (i * 7919 % 13) / 4, 2
+                )
+                yield user_id, f"series_{index}", MONTH + timedelta(
+                    seconds=i * interval
+                ), value
+
+
+def timed(function, repeat: int = 5) -> float:
+    """Return the best wall time of a function in milliseconds."""
+    best: float = math.inf
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--series", type=int, default=3)
+    parser.add_argument("--interval", type=int, default=60)
+    args = parser.parse_args()
+
+    user_ids: list = list(range(1, args.users + 1))
+    with tempfile.TemporaryDirectory() as directory:
+        path = (
+            Path(directory) / f"{partitions.partition_name(MONTH)}{cold_storage.SUFFIX}"
+        )
+        start: float = time.perf_counter()
+        total: int = cold_storage.write_file(
+            path,
+            MONTH,
+            partitions.add_months(MONTH, 1),
+            generate(user_ids, args.series, args.interval),
+        )
+        written: float = time.perf_counter() - start
+        cold_bytes: int = path.stat().st_size
+        cold_file = cold_storage.ColdFile(path)
+        cold_day: float = timed(
+            lambda: cold_file.read(1, "series_0", MONTH, MONTH + DAY)
+        )
+        cold_month: float = timed(lambda: cold_file.read(1, "series_0"))
+        cold_file.close()
+
+    print(f"samples:                 {total:,}")
+    print(f"cold write:              {total / written:,.0f} samples/s")
+    print(f"cold size:               {cold_bytes / total:.2f} bytes/sample")
+    print(f"cold read, 1 day:        {cold_day:.2f} ms")
+    print(f"cold read, 1 month:      {cold_month:.2f} ms")
+
+    if connection.vendor != "postgresql":
+        print("hot comparison skipped: requires PostgreSQL")
+        return
+
+    with transaction.atomic():
+        users: list = [
+            get_user_model().objects.create_user(email=f"bench{i}@example.com")
+            for i in user_ids
+        ]
+        ids: dict = dict(zip(user_ids, (user.id for user in users)))
+        name: str = partitions.create_partition(MONTH)
+        batch: list = []
+        for user_id, series, timestamp, value in generate(
+            user_ids, args.series, args.interval
+        ):
+            batch.append(
+                Sample(
+                    user_id=ids[user_id],
+                    series=series,
+                    timestamp=timestamp,
+                    value=value,
+                )
+            )
+            if len(batch) == 10000:
+                Sample.objects.bulk_create(batch)
+                batch = []
+        Sample.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {name}")
+            cursor.execute("SELECT pg_total_relation_size(%s)", [name])
+            hot_bytes: int = cursor.fetchone()[0]
+
+        queryset = Sample.objects.filter(user_id=ids[1], series="series_0")
+        hot_day: float = timed(
+            lambda: list(
+                queryset.filter(timestamp__gte=MONTH, timestamp__lt=MONTH + DAY)
+            )
+        )
+        hot_month: float = timed(lambda: list(queryset.order_by("timestamp")))
+        transaction.set_rollback(True)
+
+    print(f"hot size (with indexes): {hot_bytes / total:.2f} bytes/sample")
+    print(f"size reduction:          {hot_bytes / cold_bytes:.1f}x")
+    print(f"hot read, 1 day:         {hot_day:.2f} ms")
+    print(f"hot read, 1 month:       {hot_month:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Compare the development image (`Dockerfile`) with the production one.
+
+Both images are built from a copy of the repository, then for each one the
+report gives:
+
+- the size of the image;
+- the cold build time, without the layer cache (base images are pulled
+  beforehand, so that the network does not count);
+- the rebuild time after a change to the code, with the layer cache of the
+  cold build, which is the build developers wait for the most;
+- the time to ready: from `docker run` to the first HTTP response of
+  `gunicorn app.wsgi`, the median of `--runs` starts. No database is
+  needed, as none is queried before the first request to the API.
+
+Cache mounts of the production build (the pip cache) are not cleared, so
+repeated runs report the cold build with warm downloads. Requires Docker
+with BuildKit.
+
+Usage (from the `app` directory):
+    python -m benchmarks.bench_docker_image
+"""
+import argparse
+import http.client
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+ROOT: Path = Path(__file__).resolve().parents[2]
+DOCKERFILES: dict = {"current": "Dockerfile", "production": "Dockerfile.prod"}
+BASE_IMAGES: tuple = ("python:3.9-alpine3.16", "python:3.9-slim-bookworm")
+# The file changed before measuring rebuilds.
+CHANGED_FILE: str = "app/app/urls.py"
+ENVIRONMENT: dict = {"DEBUG": "0", "SECRET_KEY": "bench", "ALLOWED_HOSTS": "*"}
+
+
+def docker(*args: str, capture: bool = False) -> str:
+    """Run a docker command, failing on errors."""
+    result = subprocess.run(
+        ["docker", *args],
+        check=True,
+        stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+        stderr=subprocess.PIPE if capture else subprocess.DEVNULL,
+        text=True,
+        env={**os.environ, "DOCKER_BUILDKIT": "1"},
+    )
+    return result.stdout.strip() if capture else ""
+
+
+def build(context: Path, dockerfile: str, tag: str, cache: bool) -> float:
+    """Build an image and return the time it took in seconds."""
+    args: list = ["build", "--file", str(context / dockerfile), "--tag", tag]
+    if not cache:
+        args.append("--no-cache")
+    started: float = time.perf_counter()
+    docker(*args, str(context))
+    return time.perf_counter() - started
+
+
+def time_to_ready(tag: str, port: int, timeout: float = 60) -> float:
+    """Start a container and return the seconds until it answers HTTP."""
+    environment: list = [f"--env={name}={value}" for name, value in ENVIRONMENT.items()]
+    started: float = time.perf_counter()
+    container: str = docker(
+        "run",
+        "--detach",
+        f"--publish=127.0.0.1:{port}:8000",
+        *environment,
+        tag,
+        "gunicorn",
+        "app.wsgi",
+        capture=True,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            try:
+                # Any response, even a 404, means a worker is serving requests.
+                connection.request("GET", "/ready/")
+                connection.getresponse().read()
+                return time.perf_counter() - started
+            except (OSError, http.client.HTTPException):
+                time.sleep(0.05)
+            finally:
+                connection.close()
+        raise RuntimeError(f"{tag} did not answer within {timeout} seconds.")
+    finally:
+        docker("rm", "--force", container)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    for image in BASE_IMAGES:
+        docker("pull", image)
+
+    rows: list = []
+    with tempfile.TemporaryDirectory() as directory:
+        context = Path(directory) / "repository"
+        shutil.copytree(
+            ROOT,
+            context,
+            ignore=shutil.ignore_patterns(
+                ".git", "__pycache__", "data", ".venv", "venv"
+            ),
+        )
+        for name, dockerfile in DOCKERFILES.items():
+            tag: str = f"personal-monitor-api-bench:{name}"
+            cold: float = build(context, dockerfile, tag, cache=False)
+            with open(context / CHANGED_FILE, "a") as file:
+                file.write(f"\n# Changed to measure rebuilds of the {name} image.\n")
+            rebuild: float = build(context, dockerfile, tag, cache=True)
+            size: int = int(
+                docker("image", "inspect", "--format={{.Size}}", tag, capture=True)
+            )
+            ready: float = statistics.median(
+                time_to_ready(tag, args.port) for _ in range(args.runs)
+            )
+            rows.append((name, dockerfile, size, cold, rebuild, ready))
+
+    print(
+        f"{'image':<12}{'dockerfile':<17}{'size':>10}{'cold build':>12}"
+        f"{'rebuild':>10}{'ready':>9}"
+    )
+    for name, dockerfile, size, cold, rebuild, ready in rows:
+        print(
+            f"{name:<12}{dockerfile:<17}{size / 1e6:>8.0f}MB{cold:>11.1f}s"
+            f"{rebuild:>9.1f}s{ready:>8.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark the HTTP throughput of a serving command.
+
+Starts the server given by `--server`, then keeps `--concurrency` clients
+requesting the sample list of one user for `--duration` seconds over
+keep-alive connections, and reports requests per second, latency
+percentiles and errors. Run it once per server to compare them:
+
+- `runserver` is the development command of `docker-compose.yml`, with the
+  default `DEBUG=1`;
+- `gunicorn` is the production profile of `gunicorn.conf.py` serving
+  `app.wsgi` with `DEBUG=0`.
+
+Usage (from the `app` directory):
+    python -m benchmarks.bench_http_server --server runserver
+    python -m benchmarks.bench_http_server --server gunicorn
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+
+from core.authentication import get_or_create_token  # noqa: E402
+from core.models import Sample  # noqa: E402
+
+EMAIL: str = "bench-http@example.com"
+PATH: str = "/api/monitor/samples/?series=heart_rate"
+
+COMMANDS: dict = {
+    "runserver": [sys.executable, "manage.py", "runserver", "--noreload", "{bind}"],
+    "gunicorn": [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--config",
+        "gunicorn.conf.py",
+        "--bind",
+        "{bind}",
+        "app.wsgi",
+    ],
+}
+ENVIRONMENTS: dict = {
+    "runserver": {},
+    "gunicorn": {"DEBUG": "0", "ALLOWED_HOSTS": "127.0.0.1,localhost"},
+}
+
+
+def prepare(samples: int) -> str:
+    """Create the benchmark user and its samples, returning its token."""
+    user = get_user_model().objects.filter(email=EMAIL).first()
+    if user is None:
+        user = get_user_model().objects.create_user(email=EMAIL)
+    Sample.objects.filter(user=user).delete()
+    now: datetime = datetime.now(timezone.utc)
+    Sample.objects.bulk_create(
+        Sample(
+            user=user,
+            series="heart_rate",
+            timestamp=now - timedelta(minutes=i),
+            value=60.0 + i % 30,
+        )
+        for i in range(samples)
+    )
+    token = get_or_create_token(user)
+    return token.key
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    """Wait until a server accepts connections on a local port."""
+    deadline: float = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing is listening on port {port}.")
+
+
+def client(port: int, token: str, stop: float, latencies: list, errors: list):
+    """Send requests over one keep-alive connection until `stop`."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers: dict = {"Authorization": f"Token {token}"}
+    while time.monotonic() < stop:
+        started: float = time.perf_counter()
+        try:
+            connection.request("GET", PATH, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+            elif response.will_close:
+                connection.close()
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(type(error).__name__)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--server", choices=sorted(COMMANDS), default="gunicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args()
+
+    token: str = prepare(args.samples)
+    bind: str = f"127.0.0.1:{args.port}"
+    command: list = [part.format(bind=bind) for part in COMMANDS[args.server]]
+    server = subprocess.Popen(
+        command,
+        env={**os.environ, **ENVIRONMENTS[args.server]},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(args.port)
+        # Warm up every worker before measuring.
+        client(args.port, token, time.monotonic() + 2, [], [])
+
+        latencies: list = []
+        errors: list = []
+        stop: float = time.monotonic() + args.duration
+        threads: list = [
+            threading.Thread(
+                target=client, args=(args.port, token, stop, latencies, errors)
+            )
+            for _ in range(args.concurrency)
+        ]
+        started: float = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed: float = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    print(f"server:       {args.server} ({' '.join(command[1:])})")
+    print(f"concurrency:  {args.concurrency}")
+    print(f"requests:     {len(latencies)} ok, {len(errors)} errors")
+    print(f"throughput:   {len(latencies) / elapsed:.0f} req/s")
+    if latencies:
+        print(
+            "latency:      "
+            + ", ".join(
+                f"p{int(fraction * 100)} {percentile(latencies, fraction) * 1000:.1f} ms"
+                for fraction in (0.5, 0.95, 0.99)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark concurrent sample stream connections held by one worker.
+
+Opens `--connections` streams on a single event loop, publishes
+`--batches` sample batches to their owners and reports the memory held
+per connection and how long it takes for a batch to reach every stream.
+Authentication is skipped as it is a one-off cost per connection.
+
+Usage (from the `app` directory):
+    python -m benchmarks.bench_stream_connections --connections 10000
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+
+from monitor.pubsub import SampleHub  # noqa: E402
+from monitor.stream import SampleStreamApp  # noqa: E402
+
+
+async def run(connections: int, users: int, batches: int, batch_size: int):
+    """Run the benchmark and print its results."""
+    hub = SampleHub()
+    app = SampleStreamApp(hub=hub)
+    disconnect = asyncio.Event()
+    delivered: list = [0]
+    target: list = [0]
+    all_delivered = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict):
+        if message.get("body", b"").startswith(b"data"):
+            delivered[0] += 1
+            if delivered[0] == target[0]:
+                all_delivered.set()
+
+    tracemalloc.start()
+    baseline: int = tracemalloc.get_traced_memory()[0]
+    tasks: list = []
+    for i in range(connections):
+        subscription = hub.subscribe(user_id=i % users)
+        tasks.append(asyncio.ensure_future(app._stream(subscription, receive, send)))
+    # Let every stream send its headers and start waiting for frames.
+    await asyncio.sleep(0.5)
+    per_connection: float = (
+        tracemalloc.get_traced_memory()[0] - baseline
+    ) / connections
+    tracemalloc.stop()
+
+    samples: list = [
+        {"series": "heart_rate", "timestamp": "2022-09-01T00:00:00", "value": 70.0}
+    ] * batch_size
+    latencies: list = []
+    for _ in range(batches):
+        delivered[0] = 0
+        target[0] = connections
+        all_delivered.clear()
+        start: float = time.perf_counter()
+        for user_id in range(users):
+            hub.publish(user_id, samples)
+        await all_delivered.wait()
+        latencies.append(time.perf_counter() - start)
+
+    disconnect.set()
+    await asyncio.gather(*tasks)
+
+    latencies.sort()
+    print(f"connections:              {connections}")
+    print(f"memory per connection:    {per_connection / 1024:.1f} KiB")
+    print(f"fan-out latency p50:      {latencies[len(latencies) // 2] * 1000:.1f} ms")
+    print(f"fan-out latency max:      {latencies[-1] * 1000:.1f} ms")
+    print(f"frames delivered per sec: {connections / (sum(latencies) / batches):,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.connections, args.users, args.batches, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark the depth of a page against the latency of the user listing.
+
+Inserts `--users` users (in a transaction that is rolled back) and reports
+the time to fetch a page of `--page-size` users through `ListUserView` at
+increasing depths, next to the same page fetched with `OFFSET`, which is
+what the Django admin uses. Requires PostgreSQL.
+
+Usage (from the `app` directory):
+    python -m benchmarks.bench_user_list --users 5000000
+"""
+import argparse
+import math
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from rest_framework.pagination import Cursor  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from user.pagination import UserCursorPagination  # noqa: E402
+from user.views import ListUserView  # noqa: E402
+
+DEPTHS: tuple = (0.0, 0.1, 0.5, 0.9, 0.999)
+
+
+def timed(function, repeat: int = 5) -> float:
+    """Return the best wall time of a function in milliseconds."""
+    best: float = math.inf
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=5_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    if connection.vendor != "postgresql":
+        print("skipped: requires PostgreSQL")
+        return
+
+    table: str = get_user_model()._meta.db_table
+    factory = APIRequestFactory(SERVER_NAME="localhost")
+    view = ListUserView.as_view()
+    with transaction.atomic():
+        staff = get_user_model().objects.create_user(
+            email="bench-staff@example.com", is_staff=True
+        )
+        start: float = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table}
+                    (password, email, name, is_active, is_staff, is_superuser)
+                SELECT '!', 'bench' || i || '@example.com', '', mod(i, 10) <> 0,
+                    false, false
+                FROM generate_series(1, %s) AS i
+                """,
+                [args.users],
+            )
+            cursor.execute(f"ANALYZE {table}")
+            cursor.execute(f"SELECT min(id) FROM {table}")
+            first: int = cursor.fetchone()[0]
+        print(f"users inserted:  {args.users:,} in {time.perf_counter() - start:.1f} s")
+
+        def fetch_cursor(position: int):
+            # The cursor a client would get after reading up to `position`.
+            pagination = UserCursorPagination()
+            pagination.base_url = "/"
+            url: str = pagination.encode_cursor(
+                Cursor(offset=0, reverse=False, position=str(position))
+            )
+            token: str = parse_qs(urlsplit(url).query)["cursor"][0]
+            request = factory.get(
+                "/", {"cursor": token, "page_size": args.page_size}
+            )
+            force_authenticate(request, user=staff)
+            response = view(request)
+            assert response.status_code == 200, response.data
+            response.render()
+
+        def fetch_offset(offset: int):
+            queryset = get_user_model().objects.order_by("id")
+            list(queryset[offset:offset + args.page_size])
+
+        print(f"{'depth':>8} {'offset':>12} {'keyset (API)':>14} {'OFFSET (ORM)':>14}")
+        for depth in DEPTHS:
+            offset: int = int(args.users * depth)
+            keyset: float = timed(lambda: fetch_cursor(first + offset - 1))
+            offset_time: float = timed(lambda: fetch_offset(offset))
+            print(
+                f"{depth:>8.1%} {offset:>12,} {keyset:>11.2f} ms {offset_time:>11.2f} ms"
+            )
+        transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
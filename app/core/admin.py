@@ -8,13 +8,30 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from core.budgets import QueryBudget
 
 
 class UserAdmin(BaseUserAdmin):
-    """Define the admin pages for users."""
+    """Define the admin pages for users.
+
+    Queries go to the shard of the logged in admin, which authentication
+    activates, so the pages list and edit the users of that shard only.
+    """
 
     ordering: list = ["id"]
     list_display: list = ["email", "name"]
+    # Counting every user for the "show all" link is a full scan on a large
+    # table, on top of counting the filtered results.
+    show_full_result_count: bool = False
+
+    # Queries of each page, including loading the session and the logged in
+    # user, and the shard of the user and content type of users until they
+    # are cached.
+    query_budgets: dict = {
+        "changelist": QueryBudget(queries=6, milliseconds=500),
+        "change": QueryBudget(queries=5, milliseconds=500),
+        "add": QueryBudget(queries=4, milliseconds=500),
+    }
 
     fieldsets: tuple = (
         # The fieldsets can be dynamically updated without needing to
@@ -22,11 +39,11 @@ class UserAdmin(BaseUserAdmin):
         # We set the fieldset title to `None`.
         (None, {"fields": ("email", "password")}),
         (_("Permissions"), {"fields": ("is_active", "is_staff", "is_superuser")}),
-        # The code fails without the comma after "last_login" as fields input
-        # should either be a tuple or list.
-        (_("Important dates"), {"fields": ("last_login",)}),
+        # Both dates are written in batches, so they may lag behind by up to
+        # `LAST_SEEN_FLUSH_INTERVAL` seconds.
+        (_("Important dates"), {"fields": ("last_login", "last_activity")}),
     )
-    readonly_fields: list = ["last_login"]
+    readonly_fields: list = ["last_login", "last_activity"]
 
     add_fieldsets: tuple = (
         (
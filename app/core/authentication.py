@@ -0,0 +1,123 @@
+"""
+Authentication of users spread across shards.
+
+Users log in by email, which the global directory resolves to a shard, and
+then authenticate with API tokens whose key starts with their user id, so
+that the shard holding a token is known without querying every shard.
+Both activate the user's shard for the rest of the request.
+"""
+import secrets
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.utils.translation import gettext as _
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+
+from core import last_seen, sharding
+from core.models import UserShard
+
+# Separates the user id from the random part of a token key.
+KEY_SEPARATOR: str = "."
+KEY_LENGTH: int = Token._meta.get_field("key").max_length
+
+
+def make_key(user_id: int) -> str:
+    """Return a new token key for a user."""
+    prefix: str = f"{user_id}{KEY_SEPARATOR}"
+    # At least 96 random bits are left for any realistic user id.
+    return prefix + secrets.token_hex(KEY_LENGTH)[: KEY_LENGTH - len(prefix)]
+
+
+def get_or_create_token(user) -> Token:
+    """Return the token of a user, creating one on its shard if needed."""
+    token, _ = Token.objects.using(user._state.db).get_or_create(
+        user=user, defaults={"key": make_key(user.pk)}
+    )
+    return token
+
+
+def _token_shards(key: str, refresh: bool = False) -> Iterable[str]:
+    """Return the shards that may hold a token."""
+    user_id, separator, _ = key.partition(KEY_SEPARATOR)
+    if not separator or not user_id.isdigit():
+        # Tokens created before sharding do not name their user.
+        return settings.SHARDS
+    shard: Optional[str] = sharding.shard_of(int(user_id), refresh=refresh)
+    return [shard] if shard else []
+
+
+def get_token(key: str) -> Optional[Token]:
+    """Return the token with a key along with its user, or `None`."""
+    searched: set = set()
+    # Look again in case the user moved since its shard was cached.
+    for refresh in (False, True):
+        for shard in _token_shards(key, refresh):
+            if shard in searched:
+                continue
+            searched.add(shard)
+            token: Optional[Token] = (
+                Token.objects.using(shard)
+                .select_related("user")
+                .filter(key=key)
+                .first()
+            )
+            if token is not None:
+                return token
+    return None
+
+
+class ShardedTokenAuthentication(authentication.TokenAuthentication):
+    """Token authentication querying the shard of the token's user."""
+
+    def authenticate_credentials(self, key: str):
+        token: Optional[Token] = get_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        sharding.activate(token._state.db)
+        last_seen.record_activity(token.user)
+        return (token.user, token)
+
+
+class ShardedModelBackend(ModelBackend):
+    """Authentication backend finding users on their shard."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        shard: Optional[str] = (
+            UserShard.objects.filter(email=username)
+            .values_list("shard", flat=True)
+            .first()
+        )
+        if shard is None:
+            # Hash the password anyway, like `ModelBackend` does, so that
+            # unknown emails cannot be told apart by the response time.
+            get_user_model()().set_password(password)
+            return None
+
+        with sharding.use_shard(shard):
+            user = super().authenticate(request, username, password, **kwargs)
+        if user is not None:
+            sharding.activate(shard)
+        return user
+
+    def get_user(self, user_id):
+        searched: set = set()
+        # Look again in case the user moved since its shard was cached.
+        for refresh in (False, True):
+            shard: Optional[str] = sharding.shard_of(user_id, refresh=refresh)
+            if shard is None or shard in searched:
+                continue
+            searched.add(shard)
+            with sharding.use_shard(shard):
+                user = super().get_user(user_id)
+            if user is not None:
+                sharding.activate(shard)
+                return user
+        return None
@@ -0,0 +1,89 @@
+"""
+Query and time budgets of endpoints.
+
+Views and admin pages declare how many SQL queries, and how much time, a
+request may take, next to their code:
+
+    class ManageUserView(generics.RetrieveUpdateAPIView):
+        query_budgets: dict = {"GET": QueryBudget(queries=1, milliseconds=200)}
+
+and tests exercise them within `assertWithinBudget`, which fails with the
+SQL that was actually run when a budget is exceeded. Query counts must not
+depend on the amount of data, so tests should request pages holding more
+than one object to catch N+1 queries.
+
+Time budgets are generous bounds catching gross regressions and are scaled
+by `QUERY_BUDGET_TIME_FACTOR` on slow machines; query counts are exact.
+"""
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Dict, List, NamedTuple, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+# Statements of nested transactions, which only tests run at every request
+# as each test is wrapped in a transaction, and which are not counted.
+SAVEPOINT_PREFIXES: Tuple[str, ...] = (
+    "SAVEPOINT",
+    "RELEASE SAVEPOINT",
+    "ROLLBACK TO SAVEPOINT",
+)
+
+
+class QueryBudget(NamedTuple):
+    """The most queries and milliseconds one request may take."""
+
+    queries: int
+    milliseconds: float
+
+
+def format_queries(queries: List[dict]) -> str:
+    """Return captured queries as a numbered list with their database and durations."""
+    return "\n".join(
+        f"{index}. [{query['using']}, {query['time']}s] {query['sql']}"
+        for index, query in enumerate(queries, start=1)
+    )
+
+
+class QueryBudgetTestMixin:
+    """Test case mixin enforcing query budgets."""
+
+    @contextmanager
+    def assertWithinBudget(self, budget: QueryBudget):
+        """Fail if the block runs more queries or takes longer than `budget`.
+
+        Queries are counted on every shard, as requests may be routed to any.
+        """
+        contexts: Dict[str, CaptureQueriesContext] = {
+            using: CaptureQueriesContext(connections[using])
+            for using in dict.fromkeys(["default", *settings.SHARDS])
+        }
+        start: float = time.perf_counter()
+        with ExitStack() as stack:
+            for context in contexts.values():
+                stack.enter_context(context)
+            yield contexts
+        elapsed: float = (time.perf_counter() - start) * 1000
+
+        queries: List[dict] = [
+            {**query, "using": using}
+            for using, context in contexts.items()
+            for query in context.captured_queries
+        ]
+        counted: int = sum(
+            not query["sql"].startswith(SAVEPOINT_PREFIXES) for query in queries
+        )
+        if counted > budget.queries:
+            self.fail(
+                f"{counted} queries executed, {budget.queries} budgeted:\n"
+                f"{format_queries(queries)}"
+            )
+        allowed: float = budget.milliseconds * settings.QUERY_BUDGET_TIME_FACTOR
+        if elapsed > allowed:
+            self.fail(
+                f"{elapsed:.1f} ms taken, {allowed:.1f} ms budgeted:\n"
+                f"{format_queries(queries)}"
+            )
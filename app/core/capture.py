@@ -0,0 +1,155 @@
+"""
+Capture of sampled API requests, to be replayed by `replay_requests`.
+
+When `TRAFFIC_CAPTURE_PATH` is set, `TrafficCaptureMiddleware` appends a
+fraction (`TRAFFIC_CAPTURE_SAMPLE_RATE`) of the requests to that file, one
+JSON object per line, along with the status and duration of their response.
+Requests are sanitized before being written:
+
+- credentials are never written: the `Authorization` and `Cookie` headers
+  are dropped, only recording whether the request was authenticated, and
+  values of sensitive fields such as `password` are redacted;
+- email addresses are replaced by pseudonyms, consistently, so that
+  replayed requests still tell users apart;
+- only JSON and URL-encoded bodies of up to `TRAFFIC_CAPTURE_MAX_BODY`
+  bytes are kept; requests with other bodies are recorded but not replayed.
+
+Every worker appends whole lines with single writes to the same file,
+which is safe as long as it is opened in append mode on a local disk.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Replaces the values of sensitive fields.
+REDACTED: str = "[redacted]"
+# Names of fields, body or query ones, whose values are redacted.
+SENSITIVE_FIELDS: frozenset = frozenset(
+    ["password", "password1", "password2", "token", "key", "secret"]
+)
+# Request headers worth replaying. Anything else, including credentials, is
+# dropped.
+KEPT_HEADERS: tuple = ("Content-Type", "Accept", "Idempotency-Key")
+JSON: str = "application/json"
+FORM: str = "application/x-www-form-urlencoded"
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+def pseudonymize(email: str) -> str:
+    """Return the stable pseudonym of an email address."""
+    digest: str = hashlib.sha256(email.lower().encode()).hexdigest()[:12]
+    return f"user-{digest}@example.com"
+
+
+def sanitize(value: Any, name: str = "") -> Any:
+    """Return a JSON value with sensitive fields and email addresses replaced."""
+    if name.lower() in SENSITIVE_FIELDS:
+        return REDACTED
+    if isinstance(value, dict):
+        return {key: sanitize(item, key) for key, item in value.items()}
+    if isinstance(value, list):
+        return [sanitize(item, name) for item in value]
+    if isinstance(value, str) and EMAIL_PATTERN.fullmatch(value):
+        return pseudonymize(value)
+    return value
+
+
+def sanitize_query(query: str) -> str:
+    """Return a query string with sensitive parameters and emails replaced."""
+    return urlencode(
+        [
+            (key, sanitize(value, key))
+            for key, value in parse_qsl(query, keep_blank_values=True)
+        ]
+    )
+
+
+# File descriptors opened by this process, by path.
+_files: Dict[str, int] = {}
+_files_lock: threading.Lock = threading.Lock()
+
+
+def append(path: str, record: dict):
+    """Append a record to a capture file as one line, in a single write."""
+    with _files_lock:
+        if path not in _files:
+            _files[path] = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        fd: int = _files[path]
+    os.write(fd, json.dumps(record, separators=(",", ":")).encode() + b"\n")
+
+
+def read_capture(path: str) -> Iterator[dict]:
+    """Yield the records of a capture file, skipping truncated lines."""
+    with open(path) as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class TrafficCaptureMiddleware:
+    """Record a sample of requests and their outcome for later replay."""
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_CAPTURE_PATH:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def _body(self, request, content_type: str) -> Optional[Any]:
+        """Return the sanitized body of a request if it can be replayed."""
+        length: int = int(request.META.get("CONTENT_LENGTH") or 0)
+        if not length or length > settings.TRAFFIC_CAPTURE_MAX_BODY:
+            return None
+        try:
+            if content_type == JSON:
+                return sanitize(json.loads(request.body))
+            if content_type == FORM:
+                return sanitize(dict(parse_qsl(request.body.decode())))
+        except (ValueError, UnicodeDecodeError):
+            return None
+        return None
+
+    def __call__(self, request):
+        if random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        content_type: str = request.content_type
+        # Read before the view consumes the request stream.
+        body: Optional[Any] = self._body(request, content_type)
+        started: float = time.time()
+        response = self.get_response(request)
+        elapsed: float = time.time() - started
+
+        match = request.resolver_match
+        append(
+            settings.TRAFFIC_CAPTURE_PATH,
+            {
+                "time": started,
+                "method": request.method,
+                "path": request.path,
+                "query": sanitize_query(request.META.get("QUERY_STRING", "")),
+                "endpoint": match.view_name if match else None,
+                "authenticated": "HTTP_AUTHORIZATION" in request.META,
+                "headers": {
+                    name: request.headers[name]
+                    for name in KEPT_HEADERS
+                    if name in request.headers
+                },
+                "body": body,
+                # Requests whose body could not be kept are not replayed.
+                "has_body": bool(int(request.META.get("CONTENT_LENGTH") or 0)),
+                "status": response.status_code,
+                "ms": round(elapsed * 1000, 3),
+            },
+        )
+        return response
@@ -0,0 +1,420 @@
+"""
+Columnar cold storage for old monitoring samples.
+
+Monthly sample partitions past `COLD_STORAGE_AFTER_DAYS` are compacted into
+one file per month in `COLD_STORAGE_DIR` and then dropped from PostgreSQL.
+A file holds one segment per (user, series), each made of two columns:
+
+- timestamps, as microseconds since the epoch, delta-encoded so that
+  regularly sampled series turn into runs of identical values;
+- values, as IEEE 754 doubles.
+
+Both columns are byte-shuffled (all first bytes, then all second bytes...)
+and zlib-compressed, which is what makes slowly changing numbers compress
+well. A JSON footer indexes the segments, so a read memory-maps the file
+and only decompresses the segments of the requested user and series.
+
+    MAGIC | segment columns ... | footer (JSON) | footer length | MAGIC
+"""
+import bisect
+import heapq
+import json
+import mmap
+import os
+import sys
+import threading
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, groupby, islice
+from operator import attrgetter, itemgetter
+from pathlib import Path
+from struct import Struct
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from core import partitions
+from core.models import Sample
+
+MAGIC: bytes = b"PMCOLD1\n"
+TRAILER: Struct = Struct("<Q8s")
+SUFFIX: str = ".cold"
+
+EPOCH: datetime = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND: timedelta = timedelta(microseconds=1)
+# Number of rows fetched from the database at a time while compacting.
+CHUNK_SIZE: int = 10000
+
+
+class ColdSample(NamedTuple):
+    """A sample read from cold storage.
+
+    It exposes the same attributes as `Sample`, which is what serializers
+    need, while being an order of magnitude cheaper to build.
+    """
+
+    user_id: int
+    series: str
+    timestamp: datetime
+    value: float
+
+
+class Segment(NamedTuple):
+    """Location of the columns of one (user, series) pair in a file."""
+
+    count: int
+    first: int
+    last: int
+    timestamps: Tuple[int, int]
+    values: Tuple[int, int]
+
+
+def to_micros(value: datetime) -> int:
+    """Convert a datetime to microseconds since the epoch."""
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    """Convert microseconds since the epoch to a UTC datetime."""
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _pack(column: array) -> bytes:
+    """Byte-shuffle and compress a numeric column."""
+    # Files are always little-endian so that they can be moved between hosts.
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    raw: bytes = column.tobytes()
+    width: int = column.itemsize
+    return zlib.compress(b"".join(raw[i::width] for i in range(width)))
+
+
+def _unpack(typecode: str, blob: bytes) -> array:
+    """Decompress and un-shuffle a numeric column."""
+    shuffled: bytes = zlib.decompress(blob)
+    column = array(typecode)
+    width: int = column.itemsize
+    count: int = len(shuffled) // width
+    raw = bytearray(len(shuffled))
+    for i in range(width):
+        raw[i::width] = shuffled[i * count:(i + 1) * count]
+    column.frombytes(bytes(raw))
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def write_file(
+    path: Path,
+    start: datetime,
+    end: datetime,
+    rows: Iterable[Tuple[int, str, datetime, float]],
+) -> int:
+    """Write rows sorted by user, series and timestamp to a cold file.
+
+    Only one segment is held in memory at a time. The file is written next
+    to its destination and moved into place once complete, so readers never
+    see a partial file.
+
+    :return: The number of rows written.
+    """
+    index: Dict[str, Dict[str, list]] = {}
+    total: int = 0
+    temporary: Path = path.with_suffix(".tmp")
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        for (user_id, series), group in groupby(rows, key=itemgetter(0, 1)):
+            segment: list = list(group)
+            micros = array("q", (to_micros(row[2]) for row in segment))
+            deltas = array("q", [micros[0]])
+            deltas.extend(b - a for a, b in zip(micros, micros[1:]))
+            columns: list = []
+            for blob in (_pack(deltas), _pack(array("d", (row[3] for row in segment)))):
+                columns.append((file.tell(), len(blob)))
+                file.write(blob)
+            index.setdefault(str(user_id), {})[series] = [
+                len(segment),
+                micros[0],
+                micros[-1],
+                *columns,
+            ]
+            total += len(segment)
+
+        footer: bytes = json.dumps(
+            {"start": start.isoformat(), "end": end.isoformat(), "segments": index},
+            separators=(",", ":"),
+        ).encode()
+        file.write(footer)
+        file.write(TRAILER.pack(len(footer), MAGIC))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+    return total
+
+
+class ColdFile:
+    """A memory-mapped cold storage file."""
+
+    def __init__(self, path: Path):
+        self.path: Path = path
+        with open(path, "rb") as file:
+            self._map: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        size: int = len(self._map)
+        length, magic = TRAILER.unpack_from(self._map, size - TRAILER.size)
+        if magic != MAGIC or self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a cold storage file.")
+        footer: dict = json.loads(
+            self._map[size - TRAILER.size - length:size - TRAILER.size]
+        )
+
+        self.start: datetime = parse_datetime(footer["start"])
+        self.end: datetime = parse_datetime(footer["end"])
+        self.segments: Dict[int, Dict[str, Segment]] = {
+            int(user_id): {
+                series: Segment(count, first, last, tuple(ts), tuple(values))
+                for series, (count, first, last, ts, values) in by_series.items()
+            }
+            for user_id, by_series in footer["segments"].items()
+        }
+
+    def close(self):
+        self._map.close()
+
+    def _column(self, typecode: str, location: Tuple[int, int]) -> array:
+        offset, length = location
+        return _unpack(typecode, self._map[offset:offset + length])
+
+    def read(
+        self,
+        user_id: int,
+        series: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[ColdSample]:
+        """Return the (first `limit`) samples of a user in `[start, end)`, oldest first."""
+        low: int = to_micros(start) if start else -sys.maxsize
+        high: int = to_micros(end) if end else sys.maxsize
+        by_series: Dict[str, Segment] = self.segments.get(user_id, {})
+        if series is not None:
+            by_series = {series: by_series[series]} if series in by_series else {}
+
+        results: List[List[ColdSample]] = []
+        for name, segment in by_series.items():
+            if segment.last < low or segment.first >= high:
+                continue
+            micros = array("q", accumulate(self._column("q", segment.timestamps)))
+            first: int = bisect.bisect_left(micros, low)
+            last: int = bisect.bisect_left(micros, high)
+            if limit is not None:
+                last = min(last, first + limit)
+            if first == last:
+                continue
+            values: array = self._column("d", segment.values)
+            results.append(
+                [
+                    ColdSample(user_id, name, from_micros(micros[i]), values[i])
+                    for i in range(first, last)
+                ]
+            )
+
+        return list(islice(heapq.merge(*results, key=attrgetter("timestamp")), limit))
+
+
+# Open files by path, along with the modification time they were opened at.
+_files: Dict[Path, Tuple[int, ColdFile]] = {}
+_files_lock: threading.Lock = threading.Lock()
+
+
+def _open(path: Path) -> ColdFile:
+    """Return a cached `ColdFile`, reopening it if it was rewritten."""
+    mtime: int = path.stat().st_mtime_ns
+    with _files_lock:
+        cached = _files.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        cold_file = ColdFile(path)
+        _files[path] = (mtime, cold_file)
+    if cached:
+        cached[1].close()
+
+    return cold_file
+
+
+def storage_dir() -> Path:
+    return Path(settings.COLD_STORAGE_DIR)
+
+
+def file_path(partition_name: str, using: str = "default") -> Path:
+    """Return the path of the cold file of a partition of a shard."""
+    if using != "default":
+        partition_name = f"{using}.{partition_name}"
+    return storage_dir() / f"{partition_name}{SUFFIX}"
+
+
+def _origin(cold_file: ColdFile) -> Tuple[str, str]:
+    """Return the shard and partition name a cold file was compacted from."""
+    using, _, name = cold_file.path.stem.rpartition(".")
+    return using or "default", name
+
+
+def list_files() -> List[ColdFile]:
+    """Return every cold file, oldest first."""
+    if not storage_dir().is_dir():
+        return []
+    cold_files: List[ColdFile] = [
+        _open(path) for path in storage_dir().glob(f"*{SUFFIX}")
+    ]
+    # Names start with the shard, so they do not sort by time.
+    return sorted(cold_files, key=lambda cold_file: (cold_file.start, cold_file.path))
+
+
+def read_samples(
+    user_id: int,
+    series: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[ColdSample]:
+    """Return the (first `limit`) cold samples of a user in `[start, end)`, oldest first.
+
+    User ids are unique across shards, and the files of every shard are
+    read, so samples compacted before a user moved to another shard are
+    still found. With a `limit`, files starting after the last sample
+    needed are not read.
+    """
+    files: List[ColdFile] = [
+        cold_file
+        for cold_file in list_files()
+        if (end is None or cold_file.start < end)
+        and (start is None or cold_file.end > start)
+    ]
+    # A file may briefly coexist with its partition while it is being
+    # compacted; the database stays authoritative until it is dropped.
+    hot: Dict[str, set] = {}
+    for using in {_origin(cold_file)[0] for cold_file in files}:
+        if using in connections and connections[using].vendor == "postgresql":
+            hot[using] = {p.name for p in partitions.list_partitions(using)}
+    files = [
+        cold_file
+        for cold_file in files
+        if _origin(cold_file)[1] not in hot.get(_origin(cold_file)[0], ())
+    ]
+
+    samples: List[ColdSample] = []
+    for cold_file in files:
+        if limit is not None and len(samples) >= limit:
+            if cold_file.start > samples[limit - 1].timestamp:
+                break
+        # Files of different shards may cover the same month.
+        samples = list(
+            islice(
+                heapq.merge(
+                    samples,
+                    cold_file.read(user_id, series, start, end, limit),
+                    key=attrgetter("timestamp"),
+                ),
+                limit,
+            )
+        )
+    return samples
+
+
+def _partition_rows(
+    partition: partitions.Partition, using: str, totals: List[int]
+) -> Iterator[Tuple[int, str, datetime, float]]:
+    """Yield the rows of a partition to compact, sorted as files expect.
+
+    :param totals: Updated with the number and the sum of the ids of the
+        yielded rows, which tell whether the partition changed since.
+    """
+    rows: Iterator = (
+        Sample.objects.using(using)
+        .filter(timestamp__gte=partition.start, timestamp__lt=partition.end)
+        .order_by("user_id", "series", "timestamp")
+        .values_list("id", "user_id", "series", "timestamp", "value")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for id_, user_id, series, timestamp, value in rows:
+        totals[0] += 1
+        totals[1] += id_
+        yield user_id, series, timestamp, value
+
+
+def compact_partition(partition: partitions.Partition, using: str = "default") -> int:
+    """Move a partition's samples to a cold file and drop the partition.
+
+    The partition is read without blocking ingestion. Samples committed in
+    the meantime are caught once inserts are blocked for the drop, in which
+    case the file is written again.
+
+    :return: The number of compacted samples.
+    """
+    storage_dir().mkdir(parents=True, exist_ok=True)
+    path: Path = file_path(partition.name, using)
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        totals: List[int] = [0, 0]
+        count: int = write_file(
+            path, partition.start, partition.end, _partition_rows(partition, using, totals)
+        )
+        with connection.cursor() as cursor:
+            # Inserts lock the sample table before the partition, so locking
+            # the partition alone would deadlock with them on the drop.
+            cursor.execute(
+                f"LOCK TABLE {connection.ops.quote_name(partitions.TABLE)} "
+                f"IN SHARE ROW EXCLUSIVE MODE"
+            )
+            cursor.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(id), 0) "
+                f"FROM {connection.ops.quote_name(partition.name)}"
+            )
+            current: List[int] = list(cursor.fetchone())
+        if current != totals:
+            count = write_file(
+                path,
+                partition.start,
+                partition.end,
+                _partition_rows(partition, using, [0, 0]),
+            )
+        # The file is durable by now, so dropping the rows cannot lose data.
+        partitions.remove_partition(partition.name, using=using)
+
+    return count
+
+
+def compact_before(cutoff: datetime, using: str = "default") -> Dict[str, int]:
+    """Compact every partition that only holds samples older than `cutoff`.
+
+    :return: The number of samples compacted per partition.
+    """
+    return {
+        partition.name: compact_partition(partition, using)
+        for partition in partitions.list_partitions(using)
+        if partition.end <= cutoff
+    }
+
+
+def delete_before(cutoff: datetime, shards: Optional[Iterable[str]] = None) -> List[str]:
+    """Delete every cold file that only holds samples older than `cutoff`.
+
+    :param shards: Only delete the files compacted from these shards, by
+        default from every shard.
+    :return: The names of the deleted files.
+    """
+    deleted: List[str] = []
+    for cold_file in list_files():
+        if shards is not None and _origin(cold_file)[0] not in shards:
+            continue
+        if cold_file.end <= cutoff:
+            with _files_lock:
+                _files.pop(cold_file.path, None)
+            cold_file.close()
+            os.remove(cold_file.path)
+            deleted.append(cold_file.path.name)
+    return deleted
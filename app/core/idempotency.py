@@ -0,0 +1,136 @@
+"""
+Idempotency keys for POST endpoints.
+
+Clients on flaky networks retry requests whose response they never
+received. When a request carries an `Idempotency-Key` header, the first
+response is stored for `IDEMPOTENCY_KEY_TTL` seconds and every retry with
+the same key gets it back without running the view again:
+
+- the key is scoped to the authenticated user and bound to a fingerprint
+  of the request (method, path and body), so reusing it for a different
+  request is rejected with 422. Anonymous callers cannot be told apart, so
+  their keys are scoped to the fingerprint itself: only an identical
+  request gets the stored response back;
+- while the original is in flight, duplicates wait for its response
+  instead of running in parallel, and give up with 409 after
+  `IDEMPOTENCY_WAIT_TIMEOUT` seconds. The original holds a lock for up to
+  `IDEMPOTENCY_LOCK_TIMEOUT` seconds, which must exceed the longest
+  request, as a duplicate runs in parallel once it expires;
+- server errors are not stored, so the request can be retried.
+
+Entries live in the `IDEMPOTENCY_CACHE` cache, which must be shared by
+every worker process (the database cache by default) to catch retries
+landing on another worker.
+"""
+import hashlib
+import json
+import time
+import zlib
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext as _
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+HEADER: str = "Idempotency-Key"
+REPLAYED_HEADER: str = "Idempotent-Replayed"
+MAX_KEY_LENGTH: int = 255
+# Longest pause between two checks of an in-flight request.
+MAX_POLL_INTERVAL: float = 0.2
+
+
+def fingerprint(request: Request) -> str:
+    """Return a digest identifying the method, path and body of a request."""
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.body):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def encode_response(digest: str, response: Response) -> Tuple[str, int, bytes]:
+    """Return the compact form in which a response is stored."""
+    body: bytes = json.dumps(
+        response.data, cls=JSONEncoder, separators=(",", ":")
+    ).encode()
+    return digest, response.status_code, zlib.compress(body)
+
+
+def decode_response(stored: Tuple[str, int, bytes]) -> Response:
+    """Rebuild a stored response, marked as replayed."""
+    _, status_code, body = stored
+    return Response(
+        json.loads(zlib.decompress(body)),
+        status=status_code,
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+class IdempotentPostMixin:
+    """Make the POST handler of an API view idempotent on `Idempotency-Key`."""
+
+    def post(self, request: Request, *args, **kwargs) -> Response:
+        key: Optional[str] = request.headers.get(HEADER)
+        if key is None:
+            return super().post(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": _("Idempotency keys must be 1 to 255 characters long.")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache = caches[settings.IDEMPOTENCY_CACHE]
+        digest: str = fingerprint(request)
+        scope: str = (
+            str(request.user.pk) if request.user.is_authenticated else f"-{digest}"
+        )
+        # Keys are hashed as cache backends restrict the characters of theirs.
+        entry: str = "idempotency:" + hashlib.sha256(
+            f"{type(self).__name__}:{scope}:{key}".encode()
+        ).hexdigest()
+        lock: str = f"{entry}:lock"
+
+        deadline: float = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        interval: float = 0.01
+        while True:
+            stored = cache.get(entry)
+            if stored is not None:
+                if stored[0] != digest:
+                    return Response(
+                        {"detail": _("This idempotency key was used for another request.")},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                return decode_response(stored)
+            # `add` only succeeds for one of concurrent duplicates. The lock
+            # expires on its own in case its holder dies.
+            if cache.add(lock, digest, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                break
+            if time.monotonic() >= deadline:
+                return Response(
+                    {"detail": _("A request with this idempotency key is in progress.")},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+        try:
+            try:
+                response: Response = super().post(request, *args, **kwargs)
+            except Exception as exc:
+                # Validation errors are as deterministic as successes, so they
+                # are turned into responses here to be stored as well.
+                response = self.handle_exception(exc)
+            if response.status_code < 500:
+                cache.set(
+                    entry,
+                    encode_response(digest, response),
+                    timeout=settings.IDEMPOTENCY_KEY_TTL,
+                )
+        finally:
+            cache.delete(lock)
+
+        return response
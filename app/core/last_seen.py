@@ -0,0 +1,179 @@
+"""
+Buffered tracking of when users last logged in and were last active.
+
+Writing `last_login` on every login, and `last_activity` on every
+authenticated request, would turn each of them into an UPDATE of a hot
+row. Instead, each worker process records the times in memory, keeping only
+the latest per user, and a background thread writes them every
+`LAST_SEEN_FLUSH_INTERVAL` seconds with one bulk UPDATE per shard.
+
+The interval is both how stale the stored times may be and how much of
+them a crashing worker may lose; pending times are also written when the
+process exits. Updates never move a time backwards, so workers flushing
+out of order cannot undo each other.
+
+Flushing only starts once `start` is called by the servers' entry points
+(see `app.wsgi`), so tests and management commands never write in the
+background and flush explicitly instead.
+"""
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+FIELDS: Tuple[str, ...] = ("last_login", "last_activity")
+# Number of users updated by each UPDATE statement.
+BATCH_SIZE: int = 1000
+
+
+class LastSeenBuffer:
+    """Coalesce the last login and activity times of users until flushed."""
+
+    def __init__(self):
+        # Latest (last_login, last_activity) of each (shard, user id).
+        self._pending: Dict[Tuple[str, int], List[Optional[datetime]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._started: bool = False
+        # Process in which the flushing thread runs, as it does not survive
+        # the fork of a preloaded server into its workers.
+        self._pid: Optional[int] = None
+        self._stop: threading.Event = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, user, login: bool = False, when: Optional[datetime] = None):
+        """Record that a user was active, and logged in if `login` is set."""
+        when = when or timezone.now()
+        key: Tuple[str, int] = (user._state.db or "default", user.pk)
+        with self._lock:
+            times: List[Optional[datetime]] = self._pending.setdefault(
+                key, [None, None]
+            )
+            for index, seen in enumerate((login, True)):
+                if seen and (times[index] is None or times[index] < when):
+                    times[index] = when
+        if self._started and self._pid != os.getpid():
+            self._start_thread()
+
+    def flush(self) -> int:
+        """Write every pending time, returning the number of users updated.
+
+        Times failing to be written are kept for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        by_shard: Dict[str, list] = {}
+        for (shard, user_id), times in pending.items():
+            by_shard.setdefault(shard, []).append((user_id, times))
+
+        User = get_user_model()
+        updated: int = 0
+        for shard, entries in by_shard.items():
+            users: list = []
+            for user_id, times in entries:
+                user = User(pk=user_id)
+                for field, when in zip(FIELDS, times):
+                    if when is None:
+                        # Untouched fields are set to themselves.
+                        value = ExpressionWrapper(
+                            F(field), output_field=User._meta.get_field(field)
+                        )
+                    else:
+                        value = Greatest(Coalesce(F(field), Value(when)), Value(when))
+                    setattr(user, field, value)
+                users.append(user)
+            try:
+                User.objects.using(shard).bulk_update(
+                    users, FIELDS, batch_size=BATCH_SIZE
+                )
+            except Exception:
+                logger.exception("Failed to write last seen times on shard %s.", shard)
+                for user_id, times in entries:
+                    self._merge((shard, user_id), times)
+                continue
+            updated += len(users)
+
+        return updated
+
+    def _merge(self, key: Tuple[str, int], times: List[Optional[datetime]]):
+        """Put back times that could not be written, unless newer ones came."""
+        with self._lock:
+            current: List[Optional[datetime]] = self._pending.setdefault(
+                key, [None, None]
+            )
+            for index, when in enumerate(times):
+                if when is not None and (
+                    current[index] is None or current[index] < when
+                ):
+                    current[index] = when
+
+    def clear(self):
+        """Drop every pending time."""
+        with self._lock:
+            self._pending.clear()
+
+    def start(self):
+        """Flush periodically in the background and when the process exits."""
+        if not self._started:
+            self._started = True
+            atexit.register(self.stop)
+        self._start_thread()
+
+    def stop(self):
+        """Stop flushing in the background and write the pending times."""
+        self._stop.set()
+        self._flush_and_close()
+
+    def _start_thread(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        self._stop = threading.Event()
+        threading.Thread(
+            target=self._run, name="last-seen-flusher", daemon=True
+        ).start()
+
+    def _run(self):
+        while not self._stop.wait(settings.LAST_SEEN_FLUSH_INTERVAL):
+            self._flush_and_close()
+
+    def _flush_and_close(self):
+        try:
+            self.flush()
+        finally:
+            # The flushing thread is not a request thread, so nothing else
+            # would close the connections it opened.
+            for shard in settings.SHARDS:
+                connections[shard].close()
+
+
+# The buffer of this process.
+buffer: LastSeenBuffer = LastSeenBuffer()
+
+
+def record_login(user):
+    """Record that a user logged in now."""
+    buffer.record(user, login=True)
+
+
+def record_activity(user):
+    """Record that a user made an authenticated request now."""
+    buffer.record(user)
+
+
+def on_user_logged_in(sender, user, **kwargs):
+    """Replacement of Django's receiver writing `last_login` at every login."""
+    record_login(user)
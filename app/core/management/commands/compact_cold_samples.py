@@ -0,0 +1,48 @@
+"""
+Django command to move old sample partitions to cold storage.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import cold_storage
+
+
+class Command(BaseCommand):
+    """Django command to compact old sample partitions into cold files."""
+
+    help = "Compact the monthly sample partitions older than a threshold into cold storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.COLD_STORAGE_AFTER_DAYS,
+            help="Age in days after which a partition is compacted.",
+        )
+        parser.add_argument(
+            "--database",
+            choices=settings.SHARDS,
+            help="Shard to process, by default every shard.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        shards: list = [options["database"]] if options["database"] else settings.SHARDS
+        if any(connections[shard].vendor != "postgresql" for shard in shards):
+            raise CommandError("Sample partitioning requires PostgreSQL.")
+
+        cutoff: datetime = datetime.now(timezone.utc) - timedelta(days=options["days"])
+        total: int = 0
+        for shard in shards:
+            compacted: dict = cold_storage.compact_before(cutoff, using=shard)
+            for name, count in compacted.items():
+                self.stdout.write(
+                    f"Compacted {count} sample(s) of partition {name} on {shard}."
+                )
+            total += len(compacted)
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} partition(s) moved to cold storage.")
+        )
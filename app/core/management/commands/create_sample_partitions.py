@@ -0,0 +1,41 @@
+"""
+Django command to create the sample table's partitions ahead of time.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import partitions
+
+
+class Command(BaseCommand):
+    """Django command to create upcoming monthly sample partitions."""
+
+    help = "Create the partitions of the current and upcoming months."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.SAMPLE_PARTITIONS_AHEAD,
+            help="Number of months after the current one to create.",
+        )
+        parser.add_argument(
+            "--database",
+            choices=settings.SHARDS,
+            help="Shard to process, by default every shard.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        shards: list = [options["database"]] if options["database"] else settings.SHARDS
+        if any(connections[shard].vendor != "postgresql" for shard in shards):
+            raise CommandError("Sample partitioning requires PostgreSQL.")
+
+        total: int = 0
+        for shard in shards:
+            created: list = partitions.ensure_partitions(options["months_ahead"], using=shard)
+            for name in created:
+                self.stdout.write(f"Created partition {name} on {shard}.")
+            total += len(created)
+        self.stdout.write(self.style.SUCCESS(f"{total} partition(s) created."))
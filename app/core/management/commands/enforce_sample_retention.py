@@ -0,0 +1,72 @@
+"""
+Django command to enforce the retention policy of monitoring samples.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import cold_storage, partitions
+
+
+class Command(BaseCommand):
+    """Django command to drop the sample partitions past retention."""
+
+    help = "Drop (or detach) the monthly sample partitions older than the retention."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.SAMPLE_RETENTION_DAYS,
+            help="Number of days of samples to keep.",
+        )
+        parser.add_argument(
+            "--detach",
+            action="store_true",
+            help="Detach expired partitions into standalone tables instead of dropping them.",
+        )
+        parser.add_argument(
+            "--database",
+            choices=settings.SHARDS,
+            help="Shard to process, by default every shard.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        shards: list = [options["database"]] if options["database"] else settings.SHARDS
+        if any(connections[shard].vendor != "postgresql" for shard in shards):
+            raise CommandError("Sample partitioning requires PostgreSQL.")
+        if options["days"] is None:
+            self.stdout.write("No retention configured, keeping every sample.")
+            return
+
+        # Only partitions entirely older than the cutoff are removed, so up to
+        # a month more than the retention may be kept.
+        cutoff: datetime = datetime.now(timezone.utc) - timedelta(days=options["days"])
+        action: str = "Detached" if options["detach"] else "Dropped"
+        total: int = 0
+        for shard in shards:
+            removed: list = partitions.enforce_retention(
+                cutoff, detach=options["detach"], using=shard
+            )
+            for name in removed:
+                self.stdout.write(f"{action} partition {name} on {shard}.")
+            total += len(removed)
+            # Stray rows of the default partition are deleted, even with
+            # `--detach`, as it cannot be removed.
+            deleted: int = partitions.expire_default_partition(cutoff, using=shard)
+            if deleted:
+                self.stdout.write(
+                    f"Deleted {deleted} expired sample(s) from the default partition "
+                    f"on {shard}."
+                )
+        # Samples already moved to cold storage expire along with the rest, on
+        # the processed shards only.
+        expired_files: list = cold_storage.delete_before(
+            cutoff, shards if options["database"] else None
+        )
+        for name in expired_files:
+            self.stdout.write(f"Deleted cold storage file {name}.")
+        self.stdout.write(self.style.SUCCESS(f"{total} partition(s) removed."))
@@ -0,0 +1,67 @@
+"""
+Django command to move users between shards.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from core.models import UserShard
+
+
+class Command(BaseCommand):
+    """Django command to move one user, or even out the shards."""
+
+    help = (
+        "Move a user to another shard with --user and --to, or move users from "
+        "the fullest shards to the emptiest ones until they hold as many users."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Id or email of a user to move.")
+        parser.add_argument(
+            "--to", choices=settings.SHARDS, help="Shard to move the user to."
+        )
+        parser.add_argument(
+            "--limit", type=int, help="Maximum number of users moved to rebalance."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only print the moves that would be made.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if (options["user"] is None) != (options["to"] is None):
+            raise CommandError("--user and --to must be given together.")
+
+        if options["user"] is not None:
+            lookup: dict = (
+                {"id": int(options["user"])}
+                if options["user"].isdigit()
+                else {"email": options["user"]}
+            )
+            entry = UserShard.objects.filter(**lookup).first()
+            if entry is None:
+                raise CommandError(f"User {options['user']} does not exist.")
+            moves: list = [(entry.id, entry.shard, options["to"])]
+        else:
+            moves = sharding.plan_rebalance(options["limit"])
+
+        for user_id, source, target in moves:
+            if options["dry_run"]:
+                self.stdout.write(
+                    f"Would move user {user_id} from {source} to {target}."
+                )
+                continue
+            samples: int = sharding.move_user(user_id, target)
+            self.stdout.write(
+                f"Moved user {user_id} and {samples} sample(s) from {source} to {target}."
+            )
+
+        sizes: str = ", ".join(
+            f"{shard}: {users}" for shard, users in sharding.shard_sizes().items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(moves)} move(s). Users per shard: {sizes}.")
+        )
@@ -0,0 +1,132 @@
+"""
+Django command to replay captured requests against a running instance.
+"""
+from typing import Optional
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import capture, replay
+
+
+class Command(BaseCommand):
+    """Django command to replay a capture and report latencies and errors."""
+
+    help = (
+        "Replay requests captured by TrafficCaptureMiddleware against a running "
+        "instance, then report latency and error distributions per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "capture", help="Path of the capture (JSON lines) to replay."
+        )
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="URL of the instance to replay the requests against.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Number of clients sending requests in parallel.",
+        )
+        parser.add_argument(
+            "--speed",
+            type=float,
+            default=1.0,
+            help=(
+                "Replay rate as a multiple of the captured one, e.g. 2 for twice "
+                "as fast, or 0 to send requests as fast as possible."
+            ),
+        )
+        parser.add_argument(
+            "--token", help="Token sent with the requests that were authenticated."
+        )
+        parser.add_argument(
+            "--email", help="Email of a user to log in as instead of --token."
+        )
+        parser.add_argument("--password", help="Password of the user given by --email.")
+        parser.add_argument("--limit", type=int, help="Replay only the first requests.")
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30,
+            help="Seconds to wait for each response.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options["concurrency"] < 1 or options["speed"] < 0:
+            raise CommandError(
+                "--concurrency must be positive and --speed not negative."
+            )
+        try:
+            records: list = list(capture.read_capture(options["capture"]))
+        except OSError as error:
+            raise CommandError(f"Cannot read {options['capture']}: {error}.")
+        if options["limit"] is not None:
+            records = sorted(records, key=lambda record: record["time"])[
+                : options["limit"]
+            ]
+
+        token: Optional[str] = options["token"]
+        if options["email"]:
+            try:
+                token = replay.obtain_token(
+                    options["base_url"], options["email"], options["password"] or ""
+                )
+            except (OSError, ValueError) as error:
+                raise CommandError(str(error))
+        if token is None and any(record.get("authenticated") for record in records):
+            self.stderr.write(
+                "Authenticated requests are replayed without credentials, "
+                "pass --token or --email."
+            )
+
+        results, skipped, elapsed = replay.replay(
+            records,
+            options["base_url"],
+            concurrency=options["concurrency"],
+            speed=options["speed"],
+            token=token,
+            timeout=options["timeout"],
+        )
+        self._report(records, results, skipped, elapsed)
+
+    def _report(self, records: list, results: list, skipped: int, elapsed: float):
+        """Write the per-endpoint and overall results of a replay."""
+        self.stdout.write(
+            f"{'endpoint':<36} {'reqs':>6} {'2xx/3xx':>7} {'4xx':>5} {'5xx':>5} "
+            f"{'failed':>6} {'changed':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} "
+            f"{'capt p50':>8}"
+        )
+        for report in replay.summarize(results):
+            self.stdout.write(
+                f"{report.endpoint:<36} {report.requests:>6} {report.successes:>7} "
+                f"{report.client_errors:>5} {report.server_errors:>5} {report.failures:>6} "
+                f"{report.mismatches:>7} {report.p50:>8.1f} {report.p90:>8.1f} "
+                f"{report.p99:>8.1f} {report.max:>8.1f} {report.captured_p50:>8.1f}"
+            )
+        self.stdout.write(
+            "Latencies are in ms; 'changed' counts statuses differing from the capture."
+        )
+
+        times: list = [record["time"] for record in records]
+        captured: float = max(times) - min(times) if times else 0.0
+        lags: list = sorted(result.lag_ms for result in results)
+        self.stdout.write(
+            f"Replayed {len(results)} request(s) in {elapsed:.1f} s "
+            f"(captured over {captured:.1f} s), {skipped} skipped without a body."
+        )
+        if lags:
+            self.stdout.write(
+                f"Rate: {len(results) / max(elapsed, 1e-9):.1f} req/s. "
+                f"Send lag p99 {replay.percentile(lags, 0.99):.1f} ms, "
+                f"max {lags[-1]:.1f} ms."
+            )
+        failed: int = sum(
+            result.status is None or result.status >= 500 for result in results
+        )
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"{failed} request(s) failed or got a server error."))
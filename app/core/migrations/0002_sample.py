@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(max_length=64)),
+                ('timestamp', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='samples', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='sample',
+            index=models.Index(fields=['user', 'series', 'timestamp'], name='core_sample_user_id_961027_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_sample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('series', models.CharField(max_length=64)),
+                ('comparison', models.CharField(choices=[('gt', '>'), ('gte', '>='), ('lt', '<'), ('lte', '<=')], max_length=3)),
+                ('threshold', models.FloatField()),
+                ('duration', models.DurationField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('breach_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_sample_at', models.DateTimeField(blank=True, null=True)),
+                ('firing', models.BooleanField(default=False)),
+                ('last_fired_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='alertrule',
+            index=models.Index(fields=['user', 'series'], name='core_alertr_user_id_183049_idx'),
+        ),
+    ]
@@ -0,0 +1,128 @@
+"""
+Convert `core_sample` into a table partitioned by month on `timestamp`.
+
+PostgreSQL requires the partition key to be part of the primary key, so the
+table's primary key becomes `(id, timestamp)`. Django keeps treating `id`
+alone as the primary key, which stays unique as it comes from a sequence.
+Other database backends do not support partitioning and are left untouched.
+"""
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+TABLE = "core_sample"
+UNPARTITIONED = "core_sample_unpartitioned"
+
+
+def _months(first, last):
+    """Yield the start of every UTC month from `first` to `last`."""
+    month = datetime(first.year, first.month, 1, tzinfo=timezone.utc)
+    while month <= last:
+        yield month
+        index = month.year * 12 + month.month
+        month = datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _indexes_and_foreign_keys(cursor, table):
+    """Return the SQL recreating the secondary indexes and foreign keys."""
+    cursor.execute(
+        """
+        SELECT indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname NOT IN (
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'p'
+        )
+        """,
+        [table, table],
+    )
+    statements = [row[0].replace(" ON ONLY ", " ON ") for row in cursor.fetchall()]
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [table],
+    )
+    statements += [
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'
+        for name, definition in cursor.fetchall()
+    ]
+    return statements
+
+
+def _swap_table(cursor, create_statements):
+    """Replace `core_sample` with a new table keeping its data and indexes."""
+    recreate = _indexes_and_foreign_keys(cursor, TABLE)
+    cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{UNPARTITIONED}"')
+    # Free the name of the primary key index for the new table.
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+        [UNPARTITIONED],
+    )
+    primary_key = cursor.fetchone()[0]
+    cursor.execute(
+        f'ALTER TABLE "{UNPARTITIONED}" '
+        f'RENAME CONSTRAINT "{primary_key}" TO "{UNPARTITIONED}_pkey"'
+    )
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [UNPARTITIONED])
+    sequence = cursor.fetchone()[0]
+
+    for statement in create_statements:
+        cursor.execute(statement)
+    # The sequence would otherwise be dropped along with the old table.
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{TABLE}"."id"')
+    cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{UNPARTITIONED}"')
+    cursor.execute(f'DROP TABLE "{UNPARTITIONED}"')
+    for statement in recreate:
+        cursor.execute(statement)
+
+
+def partition_sample(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM "{TABLE}"')
+        first, last = cursor.fetchone()
+        now = datetime.now(timezone.utc)
+        months = list(_months(min(first or now, now), max(last or now, now)))
+
+        statements = [
+            f'CREATE TABLE "{TABLE}" (LIKE "{UNPARTITIONED}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("timestamp")',
+            f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY ("id", "timestamp")',
+            f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT',
+        ]
+        for month in months:
+            index = month.year * 12 + month.month
+            end = datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+            statements.append(
+                f'CREATE TABLE "{TABLE}_p{month:%Y_%m}" PARTITION OF "{TABLE}" '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        _swap_table(cursor, statements)
+
+
+def unpartition_sample(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        _swap_table(
+            cursor,
+            [
+                f'CREATE TABLE "{TABLE}" (LIKE "{UNPARTITIONED}" INCLUDING DEFAULTS)',
+                f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY ("id")',
+            ],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alertrule'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_sample, unpartition_sample),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_partition_sample'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='core_user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:54
+
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+
+def populate_directory(apps, schema_editor):
+    """Register the existing users, which all live in "default"."""
+    connection = schema_editor.connection
+    if connection.alias != "default":
+        return
+    User = apps.get_model("core", "User")
+    UserShard = apps.get_model("core", "UserShard")
+    UserShard.objects.bulk_create(
+        UserShard(id=user_id, email=email, shard="default")
+        for user_id, email in User.objects.values_list("id", "email").iterator()
+    )
+    # New users get their ids from the directory from now on.
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [UserShard]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_user_email_prefix_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("email", models.EmailField(max_length=255, unique=True)),
+                ("shard", models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.RunPython(populate_directory, migrations.RunPython.noop),
+    ]
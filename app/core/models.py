@@ -1,6 +1,9 @@
 """Database models."""
+import hashlib
 
-from django.db import models
+from django.conf import settings
+from django.db import models, router
+from django.dispatch import receiver
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -8,6 +11,40 @@ from django.contrib.auth.models import (
 )
 
 
+class UserShardManager(models.Manager):
+    """Manager for the directory of users."""
+
+    def assign(self, email: str, shard: str = None) -> "UserShard":
+        """Reserve an id for a new user and place it on a shard.
+
+        :param shard: Shard to place the user on, by default the one the
+            hash of its email maps to.
+        """
+        if shard is None:
+            digest: bytes = hashlib.sha256(email.lower().encode()).digest()
+            index: int = int.from_bytes(digest[:8], "big") % len(settings.SHARDS)
+            shard = settings.SHARDS[index]
+        return self.create(email=email, shard=shard)
+
+
+class UserShard(models.Model):
+    """Entry of the global directory locating the shard of each user.
+
+    The directory lives in the default database only (see `core.sharding`).
+    Its ids are the ids of users on every shard, which keeps them unique
+    across shards, and it is where users are looked up by email to log in.
+    """
+
+    email = models.EmailField(max_length=255, unique=True)
+    # Alias of the database holding the user and all of its data.
+    shard = models.CharField(max_length=64)
+
+    objects = UserShardManager()
+
+    def __str__(self) -> str:
+        return f"{self.email}@{self.shard}"
+
+
 class UserManager(BaseUserManager):
     """Manager for users."""
 
@@ -15,16 +52,23 @@ class UserManager(BaseUserManager):
         """Create, save, and return a new user."""
         if not email:
             raise ValueError("User must have a valid email address.")
+        email = self.normalize_email(email)
+        # The directory allocates the id of the user and picks its shard,
+        # unless the manager was bound to a database.
+        entry: UserShard = UserShard.objects.assign(email, shard=self._db)
         # `**kwargs` includes additional fields like username, is_active, etc.
-        user: User = self.model(email=self.normalize_email(email), **kwargs)
+        user: User = self.model(id=entry.id, email=email, **kwargs)
         # `set_password()` converts a human-readable password to a string
         # of random characters using a one-way hash. It is set to optional
         # in order to create users for testing that do not need access.
         user.set_password(password)
-        # With the `using` argument, the user can be saved in multiple
-        # databases at once if required.
-        # TODO: What is `self._db`?
-        user.save(using=self._db)
+        try:
+            # The id is already known, so there is no point in trying to
+            # update an existing row first.
+            user.save(using=entry.shard, force_insert=True)
+        except Exception:
+            entry.delete()
+            raise
 
         return user
 
@@ -54,9 +98,148 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     # `is_staff` determines whether a user can log into Django admin.
     is_staff = models.BooleanField(default=False)
+    # Time of the latest authenticated API request, written in batches along
+    # with `last_login` (see `core.last_seen`).
+    last_activity = models.DateTimeField(null=True, blank=True)
 
     # Assign user manager to our user class.
     # TODO: What does this mean?
     objects = UserManager()
 
     USERNAME_FIELD = "email"
+    # Written in batches rather than by `save` (see `core.last_seen`).
+    BUFFERED_FIELDS = ("last_login", "last_activity")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Remembered to keep the email of the directory in sync.
+        user._loaded_email = (
+            values[field_names.index("email")] if "email" in field_names else None
+        )
+        return user
+
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            # Users saved without `create_user`, e.g. by the admin, also get
+            # their id from the directory, on the shard their write is
+            # routed to.
+            using: str = kwargs.pop("using", None) or router.db_for_write(
+                type(self), instance=self
+            )
+            entry: UserShard = UserShard.objects.assign(self.email, shard=using)
+            self.id = entry.id
+            kwargs["force_insert"] = True
+            try:
+                super().save(*args, using=using, **kwargs)
+            except Exception:
+                self.id = None
+                entry.delete()
+                raise
+            return
+
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not args
+        ):
+            # Times written in batches by `core.last_seen` are left alone, as
+            # the values loaded with the user may be older than the stored
+            # ones by now. Callers name them in `update_fields` to write them.
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.BUFFERED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        loaded_email: str = getattr(self, "_loaded_email", None)
+        if loaded_email is not None and loaded_email != self.email:
+            UserShard.objects.filter(id=self.id).update(email=self.email)
+            self._loaded_email = self.email
+
+    class Meta:
+        # The unique index on `email` cannot serve `LIKE 'prefix%'` unless
+        # the database uses the C collation, hence a pattern index for the
+        # email prefix filter of the user listing.
+        indexes: list = [
+            models.Index(
+                fields=["email"],
+                name="core_user_email_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            )
+        ]
+
+
+@receiver(models.signals.post_delete, sender=User)
+def delete_user_shard(sender, instance: User, **kwargs):
+    """Remove a deleted user from the directory.
+
+    Only the user's current shard removes it, so that deleting the copy left
+    behind on the previous shard of a moved user does not.
+    """
+    UserShard.objects.filter(id=instance.id, shard=instance._state.db).delete()
+
+
+class Sample(models.Model):
+    """A single timestamped measurement of a monitored series for a user."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="samples"
+    )
+    # Name of the monitored quantity, e.g. "heart_rate" or "steps".
+    series = models.CharField(max_length=64)
+    timestamp = models.DateTimeField()
+    value = models.FloatField()
+
+    class Meta:
+        # Nearly every read is "one series of one user over a time range",
+        # so a composite index in that order serves all of them.
+        indexes: list = [models.Index(fields=["user", "series", "timestamp"])]
+
+    def __str__(self) -> str:
+        return f"{self.series}@{self.timestamp.isoformat()}={self.value}"
+
+
+class AlertRule(models.Model):
+    """A threshold on a user's series that must hold for some time to fire.
+
+    Besides its definition, a rule stores the state of its sliding window so
+    that it can be evaluated incrementally as samples are ingested instead
+    of re-querying the series (see `monitor.alerts`).
+    """
+
+    GREATER_THAN = "gt"
+    GREATER_THAN_OR_EQUAL = "gte"
+    LESS_THAN = "lt"
+    LESS_THAN_OR_EQUAL = "lte"
+    COMPARISON_CHOICES: list = [
+        (GREATER_THAN, ">"),
+        (GREATER_THAN_OR_EQUAL, ">="),
+        (LESS_THAN, "<"),
+        (LESS_THAN_OR_EQUAL, "<="),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="alert_rules"
+    )
+    name = models.CharField(max_length=255)
+    series = models.CharField(max_length=64)
+    comparison = models.CharField(max_length=3, choices=COMPARISON_CHOICES)
+    threshold = models.FloatField()
+    # How long the threshold must be breached before the rule fires.
+    duration = models.DurationField()
+    is_active = models.BooleanField(default=True)
+
+    # Sliding-window state, maintained by the evaluation engine.
+    breach_started_at = models.DateTimeField(null=True, blank=True)
+    last_sample_at = models.DateTimeField(null=True, blank=True)
+    firing = models.BooleanField(default=False)
+    last_fired_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Ingest looks rules up by the owner and series of a batch.
+        indexes: list = [models.Index(fields=["user", "series"])]
+
+    def __str__(self) -> str:
+        return self.name
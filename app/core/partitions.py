@@ -0,0 +1,200 @@
+"""
+Monthly range partitions of the sample table.
+
+Since migration `0004_partition_sample`, `core_sample` is a PostgreSQL table
+partitioned by range on `timestamp` with one partition per calendar month
+(UTC) and a default partition catching anything outside of them. Queries
+filtering on `timestamp` only scan the partitions that overlap their range,
+and retention is enforced by dropping (or detaching) whole partitions
+rather than running an expensive `DELETE` followed by vacuum. Only the
+default partition, which should hold few rows, is expired by `DELETE`.
+
+Partitioning is a PostgreSQL feature, so these helpers only support it.
+"""
+import re
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from core.models import Sample
+
+TABLE: str = Sample._meta.db_table
+DEFAULT_PARTITION: str = f"{TABLE}_default"
+
+BOUNDS_RE = re.compile(r"FROM \('(?P<start>[^']+)'\) TO \('(?P<end>[^']+)'\)")
+
+
+class Partition(NamedTuple):
+    """A range partition covering `[start, end)`."""
+
+    name: str
+    start: datetime
+    end: datetime
+
+
+def month_start(value: datetime) -> datetime:
+    """Return the start of the UTC month containing `value`."""
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Return the start of the month `months` after `month`."""
+    index: int = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    """Return the name of the partition holding a month."""
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def list_partitions(using: str = "default") -> List[Partition]:
+    """Return the range partitions of the sample table, oldest first."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [TABLE],
+        )
+        rows: list = cursor.fetchall()
+
+    partitions: List[Partition] = []
+    for name, bounds in rows:
+        match = BOUNDS_RE.search(bounds)
+        # The default partition has no bounds.
+        if match:
+            partitions.append(
+                Partition(
+                    name, parse_datetime(match["start"]), parse_datetime(match["end"])
+                )
+            )
+
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+def create_partition(month: datetime, using: str = "default") -> Optional[str]:
+    """Create the partition of a month unless it already exists.
+
+    Rows of that month which landed in the default partition, because the
+    partition was not created in time, are moved into it.
+
+    :return: The name of the created partition, or `None` if it existed.
+    """
+    start: datetime = month_start(month)
+    end: datetime = add_months(start, 1)
+    name: str = partition_name(start)
+    if any(partition.name == name for partition in list_partitions(using)):
+        return None
+
+    connection = connections[using]
+    quoted: str = connection.ops.quote_name(name)
+    table: str = connection.ops.quote_name(TABLE)
+    default: str = connection.ops.quote_name(DEFAULT_PARTITION)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {default} "
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [start, end],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE {quoted} PARTITION OF {table} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            return name
+
+        # Postgres refuses to add a partition whose rows are still in the
+        # default partition, so they are moved before attaching it.
+        cursor.execute(
+            f"CREATE TABLE {quoted} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {default}
+                WHERE "timestamp" >= %s AND "timestamp" < %s
+                RETURNING *
+            )
+            INSERT INTO {quoted} SELECT * FROM moved
+            """,
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {quoted} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+
+    return name
+
+
+def ensure_partitions(
+    months_ahead: int, now: Optional[datetime] = None, using: str = "default"
+) -> List[str]:
+    """Create the partitions of the current month and `months_ahead` after it.
+
+    :return: The names of the partitions that had to be created.
+    """
+    current: datetime = month_start(now or datetime.now(timezone.utc))
+    created: List[str] = []
+    for offset in range(months_ahead + 1):
+        name: Optional[str] = create_partition(add_months(current, offset), using)
+        if name:
+            created.append(name)
+
+    return created
+
+
+def enforce_retention(
+    cutoff: datetime, detach: bool = False, using: str = "default"
+) -> List[str]:
+    """Remove every partition that only holds samples older than `cutoff`.
+
+    :param detach: Detach the partitions, keeping them as standalone tables
+        (e.g. to archive them), instead of dropping them.
+    :return: The names of the removed partitions.
+    """
+    expired: List[Partition] = [
+        partition for partition in list_partitions(using) if partition.end <= cutoff
+    ]
+
+    with transaction.atomic(using=using):
+        for partition in expired:
+            remove_partition(partition.name, detach=detach, using=using)
+
+    return [partition.name for partition in expired]
+
+
+def expire_default_partition(cutoff: datetime, using: str = "default") -> int:
+    """Delete the samples older than `cutoff` from the default partition.
+
+    The default partition has no bounds and cannot be dropped, so the few
+    rows it catches expire with a `DELETE` instead.
+
+    :return: The number of deleted samples.
+    """
+    connection = connections[using]
+    default: str = connection.ops.quote_name(DEFAULT_PARTITION)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {default} WHERE "timestamp" < %s', [cutoff])
+        return cursor.rowcount
+
+
+def remove_partition(name: str, detach: bool = False, using: str = "default"):
+    """Drop a partition, or only detach it into a standalone table."""
+    connection = connections[using]
+    quoted: str = connection.ops.quote_name(name)
+    with connection.cursor() as cursor:
+        if detach:
+            table: str = connection.ops.quote_name(TABLE)
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {quoted}")
+        else:
+            cursor.execute(f"DROP TABLE {quoted}")
@@ -0,0 +1,242 @@
+"""
+Replay of captured requests (see `core.capture`) against a running instance.
+
+Requests are sent in the order and at the pace they were captured, scaled
+by `speed`, by a pool of `concurrency` clients each holding a keep-alive
+connection. When the clients cannot keep up, requests are sent late; how
+late is reported as the lag, as it means the replayed load is lower than
+the captured one.
+
+Authenticated requests are sent with the token given to the replay, as
+captures hold no credentials. Idempotency keys are prefixed with the id of
+the run, so that a replay repeats the duplicates of the capture without
+colliding with the keys of previous runs.
+"""
+import http.client
+import json
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from core.capture import FORM, JSON
+
+TOKEN_PATH: str = "/api/user/token/"
+
+
+class Result(NamedTuple):
+    """Outcome of one replayed request."""
+
+    endpoint: str
+    # `None` when no response was received.
+    status: Optional[int]
+    captured_status: int
+    ms: float
+    captured_ms: float
+    # How late the request was sent compared to its scaled capture time.
+    lag_ms: float
+
+
+class EndpointReport(NamedTuple):
+    """Latency and error distribution of the requests to one endpoint."""
+
+    endpoint: str
+    requests: int
+    successes: int
+    client_errors: int
+    server_errors: int
+    failures: int
+    # Requests whose status differs from the captured one.
+    mismatches: int
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    captured_p50: float
+
+
+def endpoint_of(record: dict) -> str:
+    """Return the method and view (or path) of a captured request."""
+    return f"{record['method']} {record.get('endpoint') or record['path']}"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return a percentile of sorted values."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def connect(base_url: str, timeout: float) -> http.client.HTTPConnection:
+    """Open a connection to the instance at `base_url`."""
+    url = urlsplit(base_url)
+    if url.scheme == "https":
+        return http.client.HTTPSConnection(url.netloc, timeout=timeout)
+    return http.client.HTTPConnection(url.netloc, timeout=timeout)
+
+
+def obtain_token(base_url: str, email: str, password: str, timeout: float = 30) -> str:
+    """Log in to the instance and return the token of the user."""
+    connection = connect(base_url, timeout)
+    try:
+        connection.request(
+            "POST",
+            TOKEN_PATH,
+            body=json.dumps({"email": email, "password": password}),
+            headers={"Content-Type": JSON},
+        )
+        response = connection.getresponse()
+        data: dict = json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+    if response.status != 200 or "token" not in data:
+        raise ValueError(f"Could not log in as {email}: {response.status} {data}.")
+    return data["token"]
+
+
+def build_request(
+    record: dict, token: Optional[str], run_id: str
+) -> Tuple[str, str, bytes, Dict[str, str]]:
+    """Return the method, path, body and headers replaying a record."""
+    path: str = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+    headers: Dict[str, str] = dict(record.get("headers") or {})
+    if "Idempotency-Key" in headers:
+        headers["Idempotency-Key"] = f"{run_id}:{headers['Idempotency-Key']}"
+    if record.get("authenticated") and token:
+        headers["Authorization"] = f"Token {token}"
+
+    body: bytes = b""
+    if record.get("body") is not None:
+        content_type: str = headers.get("Content-Type", JSON).split(";")[0]
+        body = (
+            urlencode(record["body"]).encode()
+            if content_type == FORM
+            else json.dumps(record["body"]).encode()
+        )
+    return record["method"], path, body, headers
+
+
+def _client(base_url: str, timeout: float, token, run_id, tasks, results: list):
+    """Send the requests of `tasks` over one keep-alive connection."""
+    connection = connect(base_url, timeout)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        record, due = task
+        method, path, body, headers = build_request(record, token, run_id)
+        started: float = time.monotonic()
+        status: Optional[int] = None
+        try:
+            connection.request(method, path, body=body or None, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            if response.will_close:
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+        results.append(
+            Result(
+                endpoint_of(record),
+                status,
+                record["status"],
+                (time.monotonic() - started) * 1000,
+                record["ms"],
+                max(0.0, started - due) * 1000,
+            )
+        )
+    connection.close()
+
+
+def replay(
+    records: Iterable[dict],
+    base_url: str,
+    concurrency: int = 8,
+    speed: float = 1.0,
+    token: Optional[str] = None,
+    timeout: float = 30,
+) -> Tuple[List[Result], int, float]:
+    """Replay captured requests against the instance at `base_url`.
+
+    :param speed: Replay rate as a multiple of the captured one, or 0 to
+        send the requests as fast as the clients allow.
+    :return: The results, the number of requests that could not be
+        replayed, and the duration of the replay in seconds.
+    """
+    replayable: List[dict] = []
+    skipped: int = 0
+    for record in records:
+        if record.get("has_body") and record.get("body") is None:
+            skipped += 1
+        else:
+            replayable.append(record)
+    replayable.sort(key=lambda record: record["time"])
+
+    run_id: str = uuid.uuid4().hex[:8]
+    results: List[Result] = []
+    # Bounded, so that requests wait in the scheduler rather than here when
+    # the clients fall behind, and their lag is measured.
+    tasks: queue.Queue = queue.Queue(maxsize=concurrency)
+    clients: List[threading.Thread] = [
+        threading.Thread(
+            target=_client, args=(base_url, timeout, token, run_id, tasks, results)
+        )
+        for _ in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+
+    start: float = time.monotonic()
+    first: float = replayable[0]["time"] if replayable else 0.0
+    for record in replayable:
+        due: float = start + ((record["time"] - first) / speed if speed > 0 else 0)
+        delay: float = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        tasks.put((record, due))
+    for _ in clients:
+        tasks.put(None)
+    for client in clients:
+        client.join()
+
+    return results, skipped, time.monotonic() - start
+
+
+def summarize(results: Iterable[Result]) -> List[EndpointReport]:
+    """Return the report of every endpoint, busiest first."""
+    by_endpoint: Dict[str, List[Result]] = {}
+    for result in results:
+        by_endpoint.setdefault(result.endpoint, []).append(result)
+
+    reports: List[EndpointReport] = []
+    for endpoint, group in by_endpoint.items():
+        latencies: List[float] = sorted(result.ms for result in group)
+        statuses: List[Optional[int]] = [result.status for result in group]
+        reports.append(
+            EndpointReport(
+                endpoint=endpoint,
+                requests=len(group),
+                successes=sum(
+                    status is not None and status < 400 for status in statuses
+                ),
+                client_errors=sum(
+                    status is not None and 400 <= status < 500 for status in statuses
+                ),
+                server_errors=sum(
+                    status is not None and status >= 500 for status in statuses
+                ),
+                failures=statuses.count(None),
+                mismatches=sum(
+                    result.status != result.captured_status for result in group
+                ),
+                p50=percentile(latencies, 0.5),
+                p90=percentile(latencies, 0.9),
+                p99=percentile(latencies, 0.99),
+                max=latencies[-1],
+                captured_p50=percentile(
+                    sorted(result.captured_ms for result in group), 0.5
+                ),
+            )
+        )
+    return sorted(reports, key=lambda report: (-report.requests, report.endpoint))
@@ -0,0 +1,270 @@
+"""
+User-based sharding across databases.
+
+Every database alias in `SHARDS` holds a subset of the users along with
+all of their data (tokens, samples, alert rules...), while the default
+database also holds the global directory (`UserShard`) mapping each user
+id and email to its shard. New users are placed by the hash of their
+email, and the directory records where each one actually lives, so users
+can be moved between shards afterwards (see `move_user`).
+
+Queries are routed by `ShardRouter` to the shard activated for the current
+request, which authentication sets once the user is known, or to the
+database an instance was loaded from. Code running outside of a request
+selects a shard with `use_shard`, or passes `using` explicitly.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from core.models import AlertRule, Sample, UserShard
+
+DEFAULT_SHARD: str = "default"
+# Apps whose models are only used in the default database. `django_cache`
+# is the database cache, which holds idempotency keys.
+GLOBAL_APPS: Tuple[str, ...] = ("sessions", "django_cache")
+# Number of samples copied at a time when moving a user.
+MOVE_BATCH_SIZE: int = 10000
+
+current_shard: ContextVar[str] = ContextVar("current_shard", default=DEFAULT_SHARD)
+
+
+def activate(shard: str):
+    """Route the queries of the rest of the current request to a shard."""
+    current_shard.set(shard)
+
+
+@contextmanager
+def use_shard(shard: str):
+    """Route the queries of a block to a shard."""
+    token = current_shard.set(shard)
+    try:
+        yield
+    finally:
+        current_shard.reset(token)
+
+
+def _cache_key(user_id: int) -> str:
+    return f"shard:{user_id}"
+
+
+def shard_of(user_id: int, refresh: bool = False) -> Optional[str]:
+    """Return the shard of a user, or `None` if it does not exist.
+
+    Lookups are cached for `SHARD_CACHE_TIMEOUT` seconds. An entry can be
+    stale for that long after a user is moved, so callers that do not find
+    a user on its cached shard should look again with `refresh`.
+    """
+    if not refresh:
+        shard: Optional[str] = cache.get(_cache_key(user_id))
+        if shard is not None:
+            return shard
+    shard = UserShard.objects.filter(id=user_id).values_list("shard", flat=True).first()
+    if shard is not None:
+        cache.set(_cache_key(user_id), shard, settings.SHARD_CACHE_TIMEOUT)
+    return shard
+
+
+class ShardRouter:
+    """Route queries to the shard of the current user."""
+
+    def _is_global(self, model) -> bool:
+        return model is UserShard or model._meta.app_label in GLOBAL_APPS
+
+    def db_for_read(self, model, **hints) -> str:
+        if self._is_global(model):
+            return DEFAULT_SHARD
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return current_shard.get()
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db: str, app_label: str, model_name: str = None, **hints):
+        label: str = f"{app_label}.{model_name}" if model_name else ""
+        if label.lower() == UserShard._meta.label_lower:
+            return db == DEFAULT_SHARD
+        return None
+
+
+class ShardMiddleware:
+    """Reset the active shard around every request.
+
+    Must come first, so that the shard activated by authentication stays
+    active until the response is complete and does not leak into the next
+    request handled by the same thread.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_shard.set(DEFAULT_SHARD)
+        try:
+            return self.get_response(request)
+        finally:
+            current_shard.reset(token)
+
+
+def _copy_samples(
+    user_id: int, source: str, target: str, ids: Optional[Set[int]] = None
+) -> Set[int]:
+    """Copy the samples of a user to another shard.
+
+    Sample ids come from a sequence of each shard, so copies get new ids.
+
+    :param ids: Ids of the samples to copy, by default every sample.
+    :return: The ids of the copied samples on the source.
+    """
+    copied: Set[int] = set()
+    pending: List[int] = sorted(ids) if ids is not None else []
+    after: int = 0
+    while ids is None or pending:
+        queryset = Sample.objects.using(source).filter(user_id=user_id)
+        if ids is None:
+            queryset = queryset.filter(id__gt=after)
+        else:
+            queryset = queryset.filter(id__in=pending[:MOVE_BATCH_SIZE])
+            pending = pending[MOVE_BATCH_SIZE:]
+        batch: List[Sample] = list(queryset.order_by("id")[:MOVE_BATCH_SIZE])
+        if ids is None and not batch:
+            break
+        if batch:
+            after = batch[-1].id
+        copied.update(sample.id for sample in batch)
+        for sample in batch:
+            sample.id = None
+        Sample.objects.using(target).bulk_create(batch)
+    return copied
+
+
+def move_user(user_id: int, target: str) -> int:
+    """Move a user and all of its data to another shard while it is in use.
+
+    The bulk of the samples is copied while the user keeps ingesting. Only
+    the final catch-up holds a lock on the user's row on the source shard,
+    which blocks new samples (through their foreign key check) and rule
+    state updates until the directory points to the target. Requests
+    blocked by the move fail once it completes and can be retried.
+
+    Alert rules get new ids on the target. Groups and permissions are
+    copied by id, so they must be provisioned identically on every shard.
+    Samples already in cold storage stay where they are, as cold files are
+    read for every shard. A move failing before the user is routed to the
+    target removes the partial copy; one failing after leaves the user's
+    rows on the source unused.
+
+    :return: The number of samples on the target.
+    """
+    if target not in settings.SHARDS:
+        raise ValueError(f"Unknown shard {target!r}.")
+    source: str = UserShard.objects.get(id=user_id).shard
+    if source == target:
+        return 0
+
+    User = get_user_model()
+    # The user is copied first as the target of the samples' foreign key,
+    # and updated again once locked.
+    User.objects.using(source).get(id=user_id).save(using=target, force_insert=True)
+    try:
+        copied: Set[int] = _copy_samples(user_id, source, target)
+        with transaction.atomic(using=source):
+            user = User.objects.using(source).select_for_update().get(id=user_id)
+            rules: List[AlertRule] = list(
+                AlertRule.objects.using(source)
+                .select_for_update()
+                .filter(user_id=user_id)
+            )
+            with transaction.atomic(using=target):
+                # Including the times `User.save` leaves to `core.last_seen`.
+                user.save(
+                    using=target,
+                    update_fields=[
+                        field.name
+                        for field in User._meta.concrete_fields
+                        if not field.primary_key
+                    ],
+                )
+                for relation in (User.groups.through, User.user_permissions.through):
+                    links: list = list(
+                        relation.objects.using(source).filter(user_id=user_id)
+                    )
+                    for link in links:
+                        link.id = None
+                    relation.objects.using(target).bulk_create(links)
+                Token.objects.using(target).bulk_create(
+                    Token.objects.using(source).filter(user_id=user_id)
+                )
+                for rule in rules:
+                    rule.id = None
+                AlertRule.objects.using(target).bulk_create(rules)
+                # Ids are allocated before the inserts commit, so samples
+                # committed since the first pass may have lower ids than the
+                # copied ones: every sample not copied yet is caught up.
+                missing: Set[int] = (
+                    set(
+                        Sample.objects.using(source)
+                        .filter(user_id=user_id)
+                        .values_list("id", flat=True)
+                    )
+                    - copied
+                )
+                _copy_samples(user_id, source, target, ids=missing)
+
+            # The copy is committed, so the user can be routed to the target.
+            UserShard.objects.filter(id=user_id).update(shard=target)
+            cache.delete(_cache_key(user_id))
+            Sample.objects.using(source).filter(user_id=user_id).delete()
+            User.objects.using(source).filter(id=user_id).delete()
+    except Exception:
+        # Unless the user was routed to the target, drop the partial copy.
+        if shard_of(user_id, refresh=True) == source:
+            User.objects.using(target).filter(id=user_id).delete()
+        raise
+
+    return Sample.objects.using(target).filter(user_id=user_id).count()
+
+
+def shard_sizes() -> Dict[str, int]:
+    """Return the number of users of every shard."""
+    sizes: Dict[str, int] = {shard: 0 for shard in settings.SHARDS}
+    for row in UserShard.objects.values("shard").annotate(users=Count("id")):
+        sizes[row["shard"]] = row["users"]
+    return sizes
+
+
+def plan_rebalance(limit: Optional[int] = None) -> List[Tuple[int, str, str]]:
+    """Return the moves evening out the number of users of every shard.
+
+    Users are taken from the fullest shard, most recent first, and given to
+    the emptiest one until they differ by at most one user.
+
+    :param limit: Maximum number of moves to plan.
+    :return: (user id, source shard, target shard) tuples.
+    """
+    sizes: Dict[str, int] = shard_sizes()
+    taken: Dict[str, int] = {shard: 0 for shard in sizes}
+    moves: List[Tuple[int, str, str]] = []
+    while limit is None or len(moves) < limit:
+        fullest: str = max(sizes, key=sizes.get)
+        emptiest: str = min(sizes, key=sizes.get)
+        if sizes[fullest] - sizes[emptiest] <= 1:
+            break
+        user_id: int = (
+            UserShard.objects.filter(shard=fullest)
+            .order_by("-id")
+            .values_list("id", flat=True)[taken[fullest]]
+        )
+        taken[fullest] += 1
+        sizes[fullest] -= 1
+        sizes[emptiest] += 1
+        moves.append((user_id, fullest, emptiest))
+    return moves
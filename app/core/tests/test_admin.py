@@ -5,8 +5,12 @@ from django.test import Client, TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
+from core.admin import UserAdmin
+from core.budgets import QueryBudgetTestMixin
+from core.models import UserShard
 
-class AdminSiteTests(TestCase):
+
+class AdminSiteTests(QueryBudgetTestMixin, TestCase):
     """Tests for Django admin."""
 
     def setUp(self):
@@ -19,12 +23,16 @@ class AdminSiteTests(TestCase):
         self.user = get_user_model().objects.create_user(
             email="user@example.com", password="testpass123", name="Test User"
         )
+        # More than one listed user, so that N+1 queries would show.
+        for i in range(3):
+            get_user_model().objects.create_user(email=f"user{i}@example.com")
 
     def test_users_list(self):
         """Test that users are listed on page."""
         # `reverse()` fetches the URL where the changelist is visible.
         url = reverse("admin:core_user_changelist")
-        res = self.client.get(url)
+        with self.assertWithinBudget(UserAdmin.query_budgets["changelist"]):
+            res = self.client.get(url)
 
         self.assertContains(res, self.user.name)
         self.assertContains(res, self.user.email)
@@ -34,7 +42,8 @@ class AdminSiteTests(TestCase):
         # Retrieves URL with format
         # "http://localhost:8000/admin/core/user/<user_id>/change/"
         url = reverse("admin:core_user_change", args=[self.user.id])
-        res = self.client.get(url)
+        with self.assertWithinBudget(UserAdmin.query_budgets["change"]):
+            res = self.client.get(url)
 
         # We just check if the modify user page is accessible.
         self.assertEqual(res.status_code, 200)
@@ -42,6 +51,27 @@ class AdminSiteTests(TestCase):
     def test_create_user_page(self):
         """Test the create user page works."""
         url = reverse("admin:core_user_add")
-        res = self.client.get(url)
+        with self.assertWithinBudget(UserAdmin.query_budgets["add"]):
+            res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_create_user(self):
+        """Test that users created in the admin are registered in the directory."""
+        url = reverse("admin:core_user_add")
+        res = self.client.post(
+            url,
+            {
+                "email": "new@example.com",
+                "password1": "Complex-pass-123",
+                "password2": "Complex-pass-123",
+                "name": "New User",
+                "is_active": "on",
+            },
+        )
+
+        self.assertEqual(res.status_code, 302)
+        user = get_user_model().objects.get(email="new@example.com")
+        entry = UserShard.objects.get(id=user.id)
+        self.assertEqual(entry.email, user.email)
+        self.assertEqual(entry.shard, user._state.db)
@@ -0,0 +1,126 @@
+"""
+Tests for capturing sampled, sanitized requests.
+"""
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import capture
+from core.authentication import get_or_create_token
+
+
+CREATE_USER_URL: str = reverse("user:create")
+ME_URL: str = reverse("user:me")
+
+
+class SanitizeTests(TestCase):
+    """Test removing credentials and personal data from captured values."""
+
+    def test_sensitive_fields_redacted(self):
+        """Test that passwords and tokens are redacted at any depth."""
+        value: dict = {
+            "password": "secret123",
+            "nested": [{"token": "abc"}],
+            "name": "A",
+        }
+
+        self.assertEqual(
+            capture.sanitize(value),
+            {
+                "password": capture.REDACTED,
+                "nested": [{"token": capture.REDACTED}],
+                "name": "A",
+            },
+        )
+
+    def test_emails_pseudonymized(self):
+        """Test that emails are replaced by the same pseudonym every time."""
+        pseudonym: str = capture.sanitize({"email": "Test@Example.com"})["email"]
+
+        self.assertTrue(pseudonym.startswith("user-"))
+        self.assertEqual(pseudonym, capture.pseudonymize("test@example.com"))
+
+    def test_query_sanitized(self):
+        """Test that tokens in query strings are redacted."""
+        self.assertEqual(
+            capture.sanitize_query("token=abc&series=heart_rate"),
+            "token=%5Bredacted%5D&series=heart_rate",
+        )
+
+
+class TrafficCaptureMiddlewareTests(TestCase):
+    """Test recording requests to a capture file."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path: Path = Path(directory.name) / "capture.jsonl"
+
+    def records(self) -> list:
+        return list(capture.read_capture(str(self.path))) if self.path.exists() else []
+
+    def test_request_captured(self):
+        """Test that a request is written without its credentials."""
+        user = get_user_model().objects.create_user(email="test@example.com")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {get_or_create_token(user).key}")
+
+        with self.settings(
+            TRAFFIC_CAPTURE_PATH=str(self.path), TRAFFIC_CAPTURE_SAMPLE_RATE=1
+        ):
+            client.get(ME_URL, {"fields": "email"})
+
+        (record,) = self.records()
+        self.assertEqual(record["method"], "GET")
+        self.assertEqual(record["path"], ME_URL)
+        self.assertEqual(record["query"], "fields=email")
+        self.assertEqual(record["endpoint"], "user:me")
+        self.assertEqual(record["status"], 200)
+        self.assertTrue(record["authenticated"])
+        self.assertNotIn("Token", self.path.read_text())
+
+    def test_body_sanitized(self):
+        """Test that JSON bodies are kept without passwords nor emails."""
+        payload: dict = {
+            "email": "new@example.com",
+            "password": "testpass123",
+            "name": "A",
+        }
+
+        with self.settings(
+            TRAFFIC_CAPTURE_PATH=str(self.path), TRAFFIC_CAPTURE_SAMPLE_RATE=1
+        ):
+            res = APIClient().post(CREATE_USER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, 201)
+        (record,) = self.records()
+        self.assertEqual(
+            record["body"],
+            {
+                "email": capture.pseudonymize("new@example.com"),
+                "password": capture.REDACTED,
+                "name": "A",
+            },
+        )
+        self.assertNotIn("testpass123", self.path.read_text())
+        self.assertNotIn("new@example.com", self.path.read_text())
+
+    def test_unsampled_request_not_captured(self):
+        """Test that requests outside of the sample are not written."""
+        with self.settings(
+            TRAFFIC_CAPTURE_PATH=str(self.path), TRAFFIC_CAPTURE_SAMPLE_RATE=0
+        ):
+            APIClient().get(ME_URL)
+
+        self.assertEqual(self.records(), [])
+
+    @override_settings(TRAFFIC_CAPTURE_PATH=None)
+    def test_disabled_by_default(self):
+        """Test that nothing is captured unless a path is configured."""
+        APIClient().get(ME_URL)
+
+        self.assertFalse(self.path.exists())
@@ -0,0 +1,251 @@
+"""
+Tests for the cold storage of old samples.
+"""
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from core import cold_storage, partitions
+from core.models import Sample
+
+
+START: datetime = datetime(2000, 1, 1, tzinfo=timezone.utc)
+END: datetime = datetime(2000, 2, 1, tzinfo=timezone.utc)
+
+
+def rows(user_id: int, series: str, count: int) -> list:
+    """Return `count` rows one minute apart with slowly changing values."""
+    return [
+        (user_id, series, START + timedelta(minutes=i), 60.0 + (i % 7) * 0.5)
+        for i in range(count)
+    ]
+
+
+class ColdFileTests(SimpleTestCase):
+    """Test writing and reading cold storage files."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = (
+            Path(self.directory.name) / f"core_sample_p2000_01{cold_storage.SUFFIX}"
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """Test that every row written can be read back."""
+        data: list = (
+            rows(1, "heart_rate", 500) + rows(1, "steps", 10) + rows(2, "steps", 5)
+        )
+
+        written: int = cold_storage.write_file(self.path, START, END, data)
+
+        self.assertEqual(written, len(data))
+        cold_file = cold_storage.ColdFile(self.path)
+        self.assertEqual((cold_file.start, cold_file.end), (START, END))
+        samples: list = cold_file.read(1, "heart_rate")
+        self.assertEqual(
+            [(s.series, s.timestamp, s.value) for s in samples],
+            [(series, ts, value) for _, series, ts, value in data[:500]],
+        )
+        cold_file.close()
+
+    def test_read_range_and_user(self):
+        """Test that reads are limited to a user and a time range."""
+        cold_storage.write_file(
+            self.path, START, END, rows(1, "heart_rate", 10) + rows(2, "heart_rate", 10)
+        )
+        cold_file = cold_storage.ColdFile(self.path)
+
+        samples: list = cold_file.read(
+            1, start=START + timedelta(minutes=2), end=START + timedelta(minutes=5)
+        )
+
+        self.assertEqual([s.timestamp.minute for s in samples], [2, 3, 4])
+        self.assertTrue(all(s.user_id == 1 for s in samples))
+        self.assertEqual(cold_file.read(3), [])
+        cold_file.close()
+
+    def test_series_are_merged_in_time_order(self):
+        """Test that reading every series of a user returns them interleaved."""
+        data: list = rows(1, "heart_rate", 3) + rows(1, "steps", 3)
+        cold_storage.write_file(self.path, START, END, data)
+        cold_file = cold_storage.ColdFile(self.path)
+
+        timestamps: list = [s.timestamp for s in cold_file.read(1)]
+
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(len(timestamps), 6)
+        cold_file.close()
+
+    def test_regular_series_compresses(self):
+        """Test that a regularly sampled series takes a fraction of its raw size."""
+        count: int = 43200
+        cold_storage.write_file(self.path, START, END, rows(1, "heart_rate", count))
+
+        # 16 bytes per row is the size of the raw timestamp and value.
+        self.assertLess(self.path.stat().st_size, count * 16 / 10)
+
+    def test_invalid_file_rejected(self):
+        """Test that files without the cold storage markers are rejected."""
+        self.path.write_bytes(b"x" * 64)
+
+        with self.assertRaises(ValueError):
+            cold_storage.ColdFile(self.path)
+
+
+@skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL.")
+class CompactionTests(TestCase):
+    """Test compacting partitions into cold storage against PostgreSQL."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(COLD_STORAGE_DIR=self.directory.name)
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user(email="test@example.com")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def test_compact_partition(self):
+        """Test that a compacted partition is readable from cold storage only."""
+        partitions.create_partition(START)
+        Sample.objects.bulk_create(
+            Sample(user=self.user, series=series, timestamp=timestamp, value=value)
+            for _, series, timestamp, value in rows(self.user.id, "heart_rate", 100)
+        )
+        # Postgres cannot drop a table with pending deferred foreign key
+        # checks in the same transaction.
+        connection.check_constraints()
+
+        compacted: dict = cold_storage.compact_before(END)
+
+        self.assertEqual(compacted, {"core_sample_p2000_01": 100})
+        self.assertNotIn(
+            "core_sample_p2000_01", [p.name for p in partitions.list_partitions()]
+        )
+        self.assertFalse(Sample.objects.exists())
+        samples: list = cold_storage.read_samples(self.user.id, "heart_rate")
+        self.assertEqual(len(samples), 100)
+
+    def test_file_ignored_while_partition_exists(self):
+        """Test that the database stays authoritative until a partition is dropped."""
+        partitions.create_partition(START)
+        cold_storage.write_file(
+            cold_storage.file_path("core_sample_p2000_01"),
+            START,
+            END,
+            rows(self.user.id, "heart_rate", 5),
+        )
+
+        self.assertEqual(cold_storage.read_samples(self.user.id), [])
+
+    def test_files_of_every_shard_read_in_time_order(self):
+        """Test that samples left on a previous shard are read in time order."""
+        march: datetime = datetime(2000, 3, 1, tzinfo=timezone.utc)
+        cold_storage.write_file(
+            cold_storage.file_path("core_sample_p2000_03"),
+            march,
+            datetime(2000, 4, 1, tzinfo=timezone.utc),
+            [(self.user.id, "heart_rate", march, 2.0)],
+        )
+        # Sorts after the file above by name.
+        cold_storage.write_file(
+            cold_storage.file_path("core_sample_p2000_01", "shard1"),
+            START,
+            END,
+            [(self.user.id, "heart_rate", START, 1.0)],
+        )
+
+        samples: list = cold_storage.read_samples(self.user.id)
+
+        self.assertEqual([sample.value for sample in samples], [1.0, 2.0])
+
+    def test_delete_before(self):
+        """Test that expired cold files are deleted."""
+        path: Path = cold_storage.file_path("core_sample_p2000_01")
+        cold_storage.write_file(path, START, END, rows(self.user.id, "heart_rate", 5))
+
+        self.assertEqual(cold_storage.delete_before(START), [])
+        self.assertEqual(cold_storage.delete_before(END), [path.name])
+        self.assertFalse(path.exists())
+
+    def test_delete_before_on_shards(self):
+        """Test that only the cold files of the given shards are deleted."""
+        kept: Path = cold_storage.file_path("core_sample_p2000_01", "shard1")
+        deleted: Path = cold_storage.file_path("core_sample_p2000_01")
+        for path in (kept, deleted):
+            cold_storage.write_file(path, START, END, rows(self.user.id, "heart_rate", 5))
+
+        self.assertEqual(cold_storage.delete_before(END, ["default"]), [deleted.name])
+        self.assertTrue(kept.exists())
+
+
+@skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL.")
+class CompactionConcurrencyTests(TransactionTestCase):
+    """Test compacting partitions while samples are ingested."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(COLD_STORAGE_DIR=self.directory.name)
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user(email="test@example.com")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def test_sample_inserted_during_compaction_kept(self):
+        """Test that a sample committed after the partition was read is compacted."""
+        partitions.create_partition(START)
+        Sample.objects.create(
+            user=self.user, series="heart_rate", timestamp=START, value=1
+        )
+        errors: list = []
+
+        def insert():
+            """Insert a sample from another connection."""
+            other = connections["default"]
+            try:
+                Sample.objects.create(
+                    user=self.user,
+                    series="heart_rate",
+                    timestamp=START + timedelta(minutes=1),
+                    value=2,
+                )
+            except Exception as error:
+                errors.append(error)
+            finally:
+                other.close()
+
+        write_file = cold_storage.write_file
+        calls: list = []
+
+        def write_then_insert(*args, **kwargs):
+            """Write the file, then insert a sample before the partition is dropped."""
+            count: int = write_file(*args, **kwargs)
+            calls.append(count)
+            if len(calls) == 1:
+                thread = threading.Thread(target=insert)
+                thread.start()
+                thread.join()
+            return count
+
+        with patch("core.cold_storage.write_file", side_effect=write_then_insert):
+            compacted: dict = cold_storage.compact_before(END)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(compacted, {"core_sample_p2000_01": 2})
+        self.assertEqual(
+            [sample.value for sample in cold_storage.read_samples(self.user.id)],
+            [1.0, 2.0],
+        )
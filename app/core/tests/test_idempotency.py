@@ -0,0 +1,192 @@
+"""
+Tests for idempotency keys of POST endpoints.
+"""
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.idempotency import REPLAYED_HEADER, IdempotentPostMixin
+
+
+CACHES: dict = {
+    "idempotency": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class ItemView(generics.GenericAPIView):
+    """A view counting the requests it handles."""
+
+    authentication_classes: list = []
+    permission_classes: list = []
+    calls: int = 0
+    # When set, requests signal `started` then wait until `release` is set.
+    started = None
+    release = None
+
+    def post(self, request, *args, **kwargs) -> Response:
+        type(self).calls += 1
+        if self.started is not None:
+            self.started.set()
+            self.release.wait(5)
+        if request.data.get("fail") == "server":
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if request.data.get("fail") == "client":
+            raise ValidationError({"value": "Invalid."})
+        return Response({"count": type(self).calls}, status=status.HTTP_201_CREATED)
+
+
+class IdempotentItemView(IdempotentPostMixin, ItemView):
+    """The same view with idempotency keys."""
+
+
+@override_settings(CACHES=CACHES, IDEMPOTENCY_WAIT_TIMEOUT=5)
+class IdempotencyTests(SimpleTestCase):
+    """Test replaying responses to requests with the same key."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view_class = IdempotentItemView
+        self.view_class.calls = 0
+        self.view_class.started = None
+        self.view_class.release = None
+        caches["idempotency"].clear()
+
+    def post(self, data: dict, key: str = "key-1", user_id: int = 1) -> Response:
+        """Send a request, as the user with id `user_id` unless it is `None`."""
+        headers: dict = {"HTTP_IDEMPOTENCY_KEY": key} if key is not None else {}
+        request = self.factory.post("/items/", data, format="json", **headers)
+        if user_id is not None:
+            force_authenticate(request, user=get_user_model()(id=user_id))
+        return self.view_class.as_view()(request)
+
+    def test_retry_replays_response(self):
+        """Test that a retry gets the stored response without running the view."""
+        first: Response = self.post({"value": 1})
+        retry: Response = self.post({"value": 1})
+
+        self.assertEqual(self.view_class.calls, 1)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry[REPLAYED_HEADER], "true")
+
+    def test_without_key_runs_every_time(self):
+        """Test that requests without a key are not deduplicated."""
+        self.post({"value": 1}, key=None)
+        self.post({"value": 1}, key=None)
+
+        self.assertEqual(self.view_class.calls, 2)
+
+    def test_different_keys_run_separately(self):
+        """Test that each key gets its own response."""
+        self.post({"value": 1}, key="key-1")
+        self.post({"value": 1}, key="key-2")
+
+        self.assertEqual(self.view_class.calls, 2)
+
+    def test_key_reused_for_other_request_error(self):
+        """Test that a key cannot be reused with a different body."""
+        self.post({"value": 1})
+        res: Response = self.post({"value": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(self.view_class.calls, 1)
+
+    def test_keys_scoped_to_user(self):
+        """Test that users reusing each other's keys do not share responses."""
+        self.post({"value": 1}, user_id=1)
+        res: Response = self.post({"value": 2}, user_id=2)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.view_class.calls, 2)
+
+    def test_anonymous_keys_scoped_to_request(self):
+        """Test that anonymous clients reusing a key only share identical requests."""
+        self.post({"value": 1}, user_id=None)
+        other: Response = self.post({"value": 2}, user_id=None)
+        retry: Response = self.post({"value": 1}, user_id=None)
+
+        self.assertEqual(other.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn(REPLAYED_HEADER, other)
+        self.assertEqual(retry.data, {"count": 1})
+        self.assertEqual(self.view_class.calls, 2)
+
+    def test_client_error_replayed(self):
+        """Test that validation failures are stored like successes."""
+        self.post({"fail": "client"})
+        res: Response = self.post({"fail": "client"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.view_class.calls, 1)
+
+    def test_server_error_not_stored(self):
+        """Test that a request which failed on the server can be retried."""
+        self.post({"fail": "server"})
+        self.post({"fail": "server"})
+
+        self.assertEqual(self.view_class.calls, 2)
+
+    def test_invalid_key_error(self):
+        """Test that overly long keys are rejected."""
+        res: Response = self.post({"value": 1}, key="k" * 256)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_duplicate_waits_for_original(self):
+        """Test that a duplicate of an in-flight request gets its response."""
+        self.view_class.started = threading.Event()
+        self.view_class.release = threading.Event()
+        responses: list = []
+        original = threading.Thread(
+            target=lambda: responses.append(self.post({"value": 1}))
+        )
+        original.start()
+        self.view_class.started.wait(5)
+        duplicate = threading.Thread(
+            target=lambda: responses.append(self.post({"value": 1}))
+        )
+        duplicate.start()
+        # Give the duplicate time to find the original in flight.
+        time.sleep(0.1)
+        self.view_class.release.set()
+        original.join()
+        duplicate.join()
+
+        self.assertEqual(self.view_class.calls, 1)
+        self.assertEqual([res.data for res in responses], [{"count": 1}] * 2)
+
+    def test_duplicate_gives_up_waiting(self):
+        """Test that a duplicate fails once it waited too long."""
+        self.view_class.started = threading.Event()
+        self.view_class.release = threading.Event()
+        original = threading.Thread(target=lambda: self.post({"value": 1}))
+        original.start()
+        self.view_class.started.wait(5)
+
+        with self.settings(IDEMPOTENCY_WAIT_TIMEOUT=0):
+            res: Response = self.post({"value": 1})
+        self.view_class.release.set()
+        original.join()
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_lock_outlives_wait_timeout(self):
+        """Test that a duplicate never runs while the original is in flight."""
+        self.view_class.started = threading.Event()
+        self.view_class.release = threading.Event()
+        with self.settings(IDEMPOTENCY_WAIT_TIMEOUT=0):
+            original = threading.Thread(target=lambda: self.post({"value": 1}))
+            original.start()
+            self.view_class.started.wait(5)
+            res: Response = self.post({"value": 1})
+        self.view_class.release.set()
+        original.join()
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.view_class.calls, 1)
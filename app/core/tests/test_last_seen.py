@@ -0,0 +1,159 @@
+"""
+Tests for the buffered tracking of last login and activity times.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core import last_seen
+from core.authentication import get_or_create_token
+
+
+TOKEN_URL: str = reverse("user:token")
+ME_URL: str = reverse("user:me")
+NOW: datetime = datetime(2022, 9, 1, tzinfo=timezone.utc)
+
+
+def create_user(**kwargs):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**kwargs)
+
+
+class LastSeenBufferTests(TestCase):
+    """Test coalescing and flushing the times of users."""
+
+    def setUp(self):
+        self.buffer = last_seen.LastSeenBuffer()
+        self.user = create_user(email="test@example.com")
+
+    def test_updates_coalesced(self):
+        """Test that repeated records of a user are written once, latest first."""
+        self.buffer.record(self.user, login=True, when=NOW)
+        self.buffer.record(self.user, when=NOW + timedelta(minutes=2))
+        self.buffer.record(self.user, when=NOW + timedelta(minutes=1))
+
+        self.assertEqual(len(self.buffer), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 1)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, NOW)
+        self.assertEqual(self.user.last_activity, NOW + timedelta(minutes=2))
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_users_updated_in_one_query(self):
+        """Test that every pending user is written by a single UPDATE."""
+        users: list = [self.user] + [
+            create_user(email=f"user{i}@example.com") for i in range(3)
+        ]
+        for user in users:
+            self.buffer.record(user, when=NOW)
+
+        with self.assertNumQueries(1):
+            self.buffer.flush()
+
+        self.assertEqual(
+            get_user_model().objects.filter(last_activity=NOW).count(), len(users)
+        )
+
+    def test_times_never_move_backwards(self):
+        """Test that a late flush of older times keeps the newer stored ones."""
+        get_user_model().objects.filter(id=self.user.id).update(
+            last_login=NOW, last_activity=NOW
+        )
+        self.buffer.record(self.user, login=True, when=NOW - timedelta(minutes=1))
+
+        self.buffer.flush()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, NOW)
+        self.assertEqual(self.user.last_activity, NOW)
+
+    def test_untouched_login_kept(self):
+        """Test that recording activity leaves `last_login` alone."""
+        get_user_model().objects.filter(id=self.user.id).update(last_login=NOW)
+        self.buffer.record(self.user, when=NOW + timedelta(minutes=1))
+
+        self.buffer.flush()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, NOW)
+
+    def test_stale_user_save_keeps_flushed_times(self):
+        """Test that saving a user loaded before a flush keeps the flushed times."""
+        self.buffer.record(self.user, login=True, when=NOW)
+        self.buffer.flush()
+
+        self.user.name = "New name"
+        self.user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, "New name")
+        self.assertEqual(self.user.last_login, NOW)
+        self.assertEqual(self.user.last_activity, NOW)
+
+    def test_empty_flush_runs_no_query(self):
+        """Test that nothing is written while no time is pending."""
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_kept(self):
+        """Test that times which could not be written are retried."""
+        self.buffer.record(self.user, when=NOW)
+
+        with patch(
+            "django.db.models.query.QuerySet.bulk_update", side_effect=RuntimeError
+        ), self.assertLogs("core.last_seen", "ERROR"):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(len(self.buffer), 1)
+        self.buffer.flush()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_activity, NOW)
+
+
+class LastSeenAPITests(TestCase):
+    """Test recording logins and activity from the API."""
+
+    def setUp(self):
+        last_seen.buffer.clear()
+        self.user = create_user(email="test@example.com", password="testpass123")
+
+    def tearDown(self):
+        last_seen.buffer.clear()
+
+    def test_token_login_buffered(self):
+        """Test that logging in for a token does not write `last_login` itself."""
+        res: Response = APIClient().post(
+            TOKEN_URL, {"email": "test@example.com", "password": "testpass123"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+        last_seen.buffer.flush()
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_token_request_records_activity(self):
+        """Test that authenticated requests record the activity of their user."""
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {get_or_create_token(self.user).key}"
+        )
+
+        client.get(ME_URL)
+        client.get(ME_URL)
+        last_seen.buffer.flush()
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_activity)
+        self.assertIsNone(self.user.last_login)
@@ -2,6 +2,8 @@
 Tests for models
 """
 
+from datetime import datetime, timezone
+
 # Base test class provided by Django.
 from django.test import TestCase
 
@@ -10,6 +12,8 @@ from django.test import TestCase
 # `get_user_model` to retrieve it by default.
 from django.contrib.auth import get_user_model
 
+from core import models
+
 
 class ModelTests(TestCase):
     """Test models."""
@@ -55,3 +59,15 @@ class ModelTests(TestCase):
 
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
+
+    def test_create_sample(self):
+        """Test creating a sample for a user."""
+        user = get_user_model().objects.create_user("test@example.com", "test123")
+        sample = models.Sample.objects.create(
+            user=user,
+            series="heart_rate",
+            timestamp=datetime(2022, 9, 1, tzinfo=timezone.utc),
+            value=72.0,
+        )
+
+        self.assertEqual(str(sample), "heart_rate@2022-09-01T00:00:00+00:00=72.0")
@@ -0,0 +1,140 @@
+"""
+Tests for the partitioning of the sample table.
+"""
+from datetime import datetime, timezone
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core import partitions
+from core.models import Sample
+
+
+def utc(year: int, month: int, day: int = 1) -> datetime:
+    """Return a UTC datetime."""
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+class PartitionHelperTests(SimpleTestCase):
+    """Test the partition naming and date helpers."""
+
+    def test_month_arithmetic(self):
+        """Test the computation of month boundaries."""
+        self.assertEqual(partitions.month_start(utc(2022, 9, 17)), utc(2022, 9))
+        self.assertEqual(partitions.add_months(utc(2022, 11), 2), utc(2023, 1))
+        self.assertEqual(
+            partitions.partition_name(utc(2022, 9)), "core_sample_p2022_09"
+        )
+
+    @patch("core.management.commands.create_sample_partitions.connections")
+    def test_command_requires_postgres(self, patched_connections):
+        """Test that the commands refuse to run on other databases."""
+        patched_connections.__getitem__.return_value.vendor = "sqlite"
+
+        with self.assertRaises(CommandError):
+            call_command("create_sample_partitions")
+
+
+@skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL.")
+class PartitionTests(TestCase):
+    """Test partition management against PostgreSQL."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="test@example.com")
+
+    def partition_names(self) -> list:
+        return [partition.name for partition in partitions.list_partitions()]
+
+    def partition_of(self, sample: Sample) -> str:
+        """Return the name of the partition physically holding a sample."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM core_sample WHERE id = %s",
+                [sample.id],
+            )
+            return cursor.fetchone()[0]
+
+    def test_ensure_partitions_ahead(self):
+        """Test that the current and upcoming months get a partition."""
+        created: list = partitions.ensure_partitions(2, now=utc(2040, 12, 15))
+
+        self.assertEqual(
+            created,
+            ["core_sample_p2040_12", "core_sample_p2041_01", "core_sample_p2041_02"],
+        )
+        self.assertEqual(partitions.ensure_partitions(2, now=utc(2040, 12, 15)), [])
+
+    def test_rows_move_out_of_default_partition(self):
+        """Test that a late partition takes over rows from the default one."""
+        sample = Sample.objects.create(
+            user=self.user, series="heart_rate", timestamp=utc(2040, 5, 3), value=1
+        )
+        self.assertEqual(self.partition_of(sample), partitions.DEFAULT_PARTITION)
+
+        partitions.create_partition(utc(2040, 5))
+
+        self.assertEqual(self.partition_of(sample), "core_sample_p2040_05")
+        self.assertTrue(Sample.objects.filter(id=sample.id).exists())
+
+    def test_enforce_retention_drops_partitions(self):
+        """Test that expired partitions are dropped along with their rows."""
+        partitions.create_partition(utc(2000, 1))
+        partitions.create_partition(utc(2000, 2))
+        Sample.objects.create(
+            user=self.user, series="heart_rate", timestamp=utc(2000, 1, 10), value=1
+        )
+        # Run the deferred foreign key checks of the insert now, as Postgres
+        # cannot drop a table with pending checks in the same transaction.
+        connection.check_constraints()
+
+        removed: list = partitions.enforce_retention(cutoff=utc(2000, 2, 15))
+
+        self.assertEqual(removed, ["core_sample_p2000_01"])
+        self.assertNotIn("core_sample_p2000_01", self.partition_names())
+        self.assertIn("core_sample_p2000_02", self.partition_names())
+        self.assertFalse(Sample.objects.exists())
+
+    def test_expire_default_partition(self):
+        """Test that expired rows of the default partition are deleted."""
+        old = Sample.objects.create(
+            user=self.user, series="heart_rate", timestamp=utc(2000, 1, 10), value=1
+        )
+        recent = Sample.objects.create(
+            user=self.user, series="heart_rate", timestamp=utc(2000, 3, 10), value=2
+        )
+        self.assertEqual(self.partition_of(old), partitions.DEFAULT_PARTITION)
+
+        deleted: int = partitions.expire_default_partition(cutoff=utc(2000, 2))
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(Sample.objects.filter(id=old.id).exists())
+        self.assertTrue(Sample.objects.filter(id=recent.id).exists())
+
+    def test_enforce_retention_detach(self):
+        """Test that detached partitions are kept as standalone tables."""
+        partitions.create_partition(utc(2000, 1))
+
+        partitions.enforce_retention(cutoff=utc(2000, 2), detach=True)
+
+        self.assertNotIn("core_sample_p2000_01", self.partition_names())
+        self.assertIn("core_sample_p2000_01", connection.introspection.table_names())
+
+    def test_range_query_prunes_partitions(self):
+        """Test that a range query only scans the partitions it overlaps."""
+        partitions.ensure_partitions(1, now=utc(2040, 1))
+        queryset = Sample.objects.filter(
+            user=self.user,
+            timestamp__gte=utc(2040, 2, 3),
+            timestamp__lt=utc(2040, 2, 5),
+        )
+
+        plan: str = queryset.explain()
+
+        self.assertIn("core_sample_p2040_02", plan)
+        self.assertNotIn("core_sample_p2040_01", plan)
+        self.assertNotIn(partitions.DEFAULT_PARTITION, plan)
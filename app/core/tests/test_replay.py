@@ -0,0 +1,111 @@
+"""
+Tests for replaying captured requests.
+"""
+import json
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import LiveServerTestCase
+from django.urls import reverse
+
+from core import replay
+from core.authentication import get_or_create_token
+
+
+ME_URL: str = reverse("user:me")
+SAMPLES_URL: str = reverse("monitor:samples")
+
+
+def record(
+    path: str, endpoint: str, method: str = "GET", status: int = 200, **kwargs
+) -> dict:
+    """Return a captured request."""
+    return {
+        "time": time.time(),
+        "method": method,
+        "path": path,
+        "query": "",
+        "endpoint": endpoint,
+        "authenticated": True,
+        "headers": {},
+        "body": None,
+        "has_body": False,
+        "status": status,
+        "ms": 1.0,
+        **kwargs,
+    }
+
+
+class ReplayTests(LiveServerTestCase):
+    """Test replaying a capture against a live server."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com", password="testpass123"
+        )
+        self.token: str = get_or_create_token(self.user).key
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path: Path = Path(directory.name) / "capture.jsonl"
+
+    def write_capture(self, records: list):
+        self.path.write_text("".join(json.dumps(r) + "\n" for r in records))
+
+    def test_replay_report(self):
+        """Test that every request is replayed and reported per endpoint."""
+        samples: list = [
+            {"series": "heart_rate", "timestamp": "2022-09-01T00:00:00Z", "value": 60}
+        ]
+        self.write_capture(
+            [record(ME_URL, "user:me") for _ in range(3)]
+            + [
+                record(
+                    SAMPLES_URL,
+                    "monitor:samples",
+                    method="POST",
+                    status=201,
+                    headers={"Content-Type": "application/json"},
+                    body=samples,
+                    has_body=True,
+                ),
+                # A body that was not captured cannot be replayed.
+                record(SAMPLES_URL, "monitor:samples", method="POST", has_body=True),
+            ]
+        )
+
+        out = StringIO()
+        call_command(
+            "replay_requests",
+            str(self.path),
+            base_url=self.live_server_url,
+            email="test@example.com",
+            password="testpass123",
+            concurrency=2,
+            speed=0,
+            stdout=out,
+        )
+
+        output: str = out.getvalue()
+        self.assertIn("GET user:me", output)
+        self.assertIn("POST monitor:samples", output)
+        self.assertIn("Replayed 4 request(s)", output)
+        self.assertIn("1 skipped", output)
+        self.assertIn("0 request(s) failed", output)
+        self.assertEqual(self.user.samples.count(), 1)
+
+    def test_errors_reported(self):
+        """Test that statuses differing from the capture are counted."""
+        self.write_capture([record(ME_URL, "user:me", authenticated=False)])
+
+        results, skipped, _ = replay.replay(
+            [json.loads(self.path.read_text())], self.live_server_url, speed=0
+        )
+        (report,) = replay.summarize(results)
+
+        self.assertEqual(report.requests, 1)
+        self.assertEqual(report.client_errors, 1)
+        self.assertEqual(report.mismatches, 1)
@@ -0,0 +1,276 @@
+"""
+Tests for user-based sharding.
+"""
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.authentication import KEY_SEPARATOR, get_or_create_token, get_token
+from core.models import AlertRule, Sample, UserShard
+
+
+ME_URL: str = reverse("user:me")
+TOKEN_URL: str = reverse("user:token")
+SAMPLES_URL: str = reverse("monitor:samples")
+START: datetime = datetime(2022, 9, 1, tzinfo=timezone.utc)
+# Set up by `app.settings_test` only.
+HAS_SECOND_SHARD: bool = "shard_test" in settings.DATABASES
+
+
+def create_user(shard: str, email: str, **kwargs):
+    """Create and return a new user on a shard."""
+    return (
+        get_user_model()
+        .objects.db_manager(shard)
+        .create_user(email=email, password="testpass123", **kwargs)
+    )
+
+
+def add_samples(user, count: int):
+    """Store `count` samples one minute apart for a user on its shard."""
+    Sample.objects.using(user._state.db).bulk_create(
+        [
+            Sample(
+                user=user,
+                series="heart_rate",
+                timestamp=START + timedelta(minutes=i),
+                value=i,
+            )
+            for i in range(count)
+        ]
+    )
+
+
+@skipUnless(HAS_SECOND_SHARD, "Requires a second shard.")
+@override_settings(SHARDS=["default", "shard_test"])
+class ShardingTests(TestCase):
+    """Test placing, routing and moving users across shards."""
+
+    databases: set = {"default", "shard_test"} if HAS_SECOND_SHARD else {"default"}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_user_placed_on_shard(self):
+        """Test that users are created on a shard and registered in the directory."""
+        first = create_user("default", "first@example.com")
+        second = create_user("shard_test", "second@example.com")
+
+        self.assertEqual(second._state.db, "shard_test")
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(sharding.shard_of(second.id), "shard_test")
+        self.assertFalse(
+            get_user_model().objects.using("default").filter(id=second.id).exists()
+        )
+        self.assertTrue(
+            get_user_model().objects.using("shard_test").filter(id=second.id).exists()
+        )
+
+    def test_placement_by_email_hash(self):
+        """Test that new users are spread over every shard by default."""
+        shards: set = {
+            get_user_model().objects.create_user(email=f"user{i}@example.com")._state.db
+            for i in range(20)
+        }
+
+        self.assertEqual(shards, {"default", "shard_test"})
+
+    def test_directory_follows_user(self):
+        """Test that email changes and deletions are reflected in the directory."""
+        user = (
+            get_user_model()
+            .objects.using("shard_test")
+            .get(id=create_user("shard_test", "old@example.com").id)
+        )
+        user.email = "new@example.com"
+        user.save()
+
+        self.assertEqual(UserShard.objects.get(id=user.id).email, "new@example.com")
+
+        user.delete()
+
+        self.assertFalse(UserShard.objects.filter(id=user.id).exists())
+
+    def test_queries_routed_to_active_shard(self):
+        """Test that unqualified queries go to the active shard."""
+        user = create_user("shard_test", "test@example.com")
+        add_samples(user, 2)
+
+        self.assertEqual(Sample.objects.count(), 0)
+        with sharding.use_shard("shard_test"):
+            self.assertEqual(Sample.objects.count(), 2)
+
+    def test_token_key_names_user(self):
+        """Test that token keys start with the id of their user."""
+        user = create_user("shard_test", "test@example.com")
+        token: Token = get_or_create_token(user)
+
+        self.assertTrue(token.key.startswith(f"{user.id}{KEY_SEPARATOR}"))
+        self.assertEqual(token._state.db, "shard_test")
+        self.assertEqual(get_token(token.key).user, user)
+
+    def test_legacy_token_found(self):
+        """Test that tokens created before sharding are looked up on every shard."""
+        user = create_user("shard_test", "test@example.com")
+        Token.objects.using("shard_test").create(user=user, key="a" * 40)
+
+        self.assertEqual(get_token("a" * 40).user, user)
+
+    def test_login_and_use_token(self):
+        """Test logging in by email and using the API on another shard."""
+        user = create_user("shard_test", "test@example.com")
+        client = APIClient()
+
+        res: Response = client.post(
+            TOKEN_URL, {"email": "test@example.com", "password": "testpass123"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        client.credentials(HTTP_AUTHORIZATION=f"Token {res.data['token']}")
+        res = client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], user.email)
+
+        payload: list = [
+            {"series": "heart_rate", "timestamp": START.isoformat(), "value": 60.0}
+        ]
+        res = client.post(SAMPLES_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Sample.objects.using("shard_test").filter(user_id=user.id).count(), 1
+        )
+        self.assertFalse(Sample.objects.using("default").exists())
+
+    def test_admin_works_on_own_shard(self):
+        """Test that the admin lists the users of the logged in admin's shard."""
+        admin = create_user("shard_test", "admin@example.com", is_staff=True)
+        admin.is_superuser = True
+        admin.save()
+        create_user("shard_test", "near@example.com")
+        create_user("default", "far@example.com")
+        self.client.force_login(admin)
+
+        res = self.client.get(reverse("admin:core_user_changelist"))
+
+        self.assertContains(res, "near@example.com")
+        self.assertNotContains(res, "far@example.com")
+
+    def test_duplicate_email_across_shards_rejected(self):
+        """Test that an email cannot be registered twice, even on another shard."""
+        create_user("shard_test", "test@example.com")
+
+        res: Response = APIClient().post(
+            reverse("user:create"),
+            {"email": "test@example.com", "password": "testpass123", "name": "Test"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_move_user(self):
+        """Test that a user moves along with its token, rules and samples."""
+        user = create_user("default", "test@example.com")
+        token: Token = get_or_create_token(user)
+        AlertRule.objects.create(
+            user=user,
+            name="High heart rate",
+            series="heart_rate",
+            comparison="gt",
+            threshold=100,
+            duration=timedelta(minutes=1),
+        )
+        add_samples(user, 5)
+        # Cache the current shard, which the move must invalidate.
+        sharding.shard_of(user.id)
+
+        moved: int = sharding.move_user(user.id, "shard_test")
+
+        self.assertEqual(moved, 5)
+        self.assertEqual(sharding.shard_of(user.id), "shard_test")
+        self.assertFalse(
+            get_user_model().objects.using("default").filter(id=user.id).exists()
+        )
+        self.assertFalse(Sample.objects.using("default").exists())
+        self.assertEqual(
+            AlertRule.objects.using("shard_test").filter(user_id=user.id).count(), 1
+        )
+        self.assertEqual(get_token(token.key)._state.db, "shard_test")
+        self.assertTrue(UserShard.objects.filter(id=user.id).exists())
+
+    def test_move_user_copies_late_commits(self):
+        """Test that samples committed during the move with lower ids are moved."""
+        user = create_user("default", "test@example.com")
+        add_samples(user, 3)
+        ids: list = list(
+            Sample.objects.filter(user=user).order_by("id").values_list("id", flat=True)
+        )
+        late: Sample = Sample.objects.get(id=ids[1])
+        late.delete()
+        copy_samples = sharding._copy_samples
+
+        def commit_late(*args, **kwargs):
+            """Copy samples, then commit one whose id was allocated earlier."""
+            copied: set = copy_samples(*args, **kwargs)
+            if "ids" not in kwargs:
+                Sample.objects.using("default").bulk_create([late])
+            return copied
+
+        with patch("core.sharding._copy_samples", side_effect=commit_late):
+            moved: int = sharding.move_user(user.id, "shard_test")
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(
+            sorted(
+                Sample.objects.using("shard_test")
+                .filter(user_id=user.id)
+                .values_list("value", flat=True)
+            ),
+            [0, 1, 2],
+        )
+
+    def test_move_to_unknown_shard_error(self):
+        """Test that users cannot be moved to a shard that is not configured."""
+        user = create_user("default", "test@example.com")
+
+        with self.assertRaises(ValueError):
+            sharding.move_user(user.id, "elsewhere")
+
+    def test_rebalance(self):
+        """Test that rebalancing evens out the number of users per shard."""
+        for i in range(5):
+            create_user("default", f"user{i}@example.com")
+
+        self.assertEqual(len(sharding.plan_rebalance()), 2)
+
+        out = StringIO()
+        call_command("rebalance_shards", stdout=out)
+
+        self.assertEqual(sharding.shard_sizes(), {"default": 3, "shard_test": 2})
+        self.assertEqual(sharding.plan_rebalance(), [])
+        self.assertIn("2 move(s)", out.getvalue())
+
+    def test_rebalance_dry_run(self):
+        """Test that a dry run moves nobody."""
+        user = create_user("default", "test@example.com")
+
+        call_command(
+            "rebalance_shards",
+            user="test@example.com",
+            to="shard_test",
+            dry_run=True,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(sharding.shard_of(user.id), "default")
@@ -0,0 +1,46 @@
+"""
+Production configuration of gunicorn, used instead of `runserver`.
+
+The REST API is served through `app.wsgi` by threaded workers, and the
+sample stream through `app.asgi` by uvicorn workers (set
+`GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker`), since Django 3.2
+runs every synchronous view of an ASGI application on a single thread.
+Every setting can be overridden through the environment, e.g.:
+
+    gunicorn app.wsgi
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn app.asgi
+"""
+import multiprocessing
+import os
+from typing import Optional
+
+cpu_count: int = multiprocessing.cpu_count()
+
+bind: str = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class: str = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+# Threaded workers spend most of their time waiting on the database, so the
+# usual `2 * CPUs + 1` keeps every CPU busy. Event loop workers never block
+# and one per CPU is enough.
+default_workers: int = cpu_count if "uvicorn" in worker_class else 2 * cpu_count + 1
+workers: int = int(os.environ.get("GUNICORN_WORKERS", default_workers))
+threads: int = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Load the application once in the master before forking, so that workers
+# share its memory pages copy-on-write and start faster.
+preload_app: bool = True
+
+# Restart each worker after a number of requests, jittered so that they do
+# not all restart at once, to bound the growth of its memory.
+max_requests: int = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter: int = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+timeout: int = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout: int = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive: int = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Workers heartbeat through a file, which must not live on a slow disk.
+worker_tmp_dir: Optional[str] = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog: str = "-"
+errorlog: str = "-"
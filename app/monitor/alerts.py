@@ -0,0 +1,150 @@
+"""
+Incremental evaluation of threshold alert rules.
+
+A rule such as "heart_rate > 150 for 5 minutes" only needs to remember when
+the current breach started, so each rule carries that state and is updated
+sample by sample as batches are ingested. Rules are indexed by series so a
+sample only touches the rules that watch its series, and nothing is ever
+re-queried from the stored samples.
+"""
+import logging
+import operator
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Set
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import connections, transaction
+
+from core.models import AlertRule, Sample
+
+logger = logging.getLogger(__name__)
+
+COMPARATORS: Dict[str, Callable[[float, float], bool]] = {
+    AlertRule.GREATER_THAN: operator.gt,
+    AlertRule.GREATER_THAN_OR_EQUAL: operator.ge,
+    AlertRule.LESS_THAN: operator.lt,
+    AlertRule.LESS_THAN_OR_EQUAL: operator.le,
+}
+
+# Every column of `AlertRule` that the engine may change.
+STATE_FIELDS: list = ["breach_started_at", "last_sample_at", "firing", "last_fired_at"]
+
+
+class Evaluation(NamedTuple):
+    """Outcome of evaluating a batch of samples against some rules."""
+
+    changed: List[AlertRule]
+    fired: List[AlertRule]
+    evaluations: int
+
+
+def observe(rule: AlertRule, timestamp, value: float) -> bool:
+    """Advance the window of a rule by one sample.
+
+    :return: Whether the rule started firing with this sample.
+    """
+    if rule.last_sample_at is not None and timestamp <= rule.last_sample_at:
+        # Late or duplicate samples cannot be placed in a window that has
+        # already moved past them.
+        return False
+    rule.last_sample_at = timestamp
+
+    if not COMPARATORS[rule.comparison](value, rule.threshold):
+        rule.breach_started_at = None
+        rule.firing = False
+        return False
+
+    if rule.breach_started_at is None:
+        rule.breach_started_at = timestamp
+    if not rule.firing and timestamp - rule.breach_started_at >= rule.duration:
+        rule.firing = True
+        rule.last_fired_at = timestamp
+        return True
+
+    return False
+
+
+def evaluate(rules: Iterable[AlertRule], samples: Iterable[Sample]) -> Evaluation:
+    """Evaluate samples of a single user against that user's rules."""
+    by_series: Dict[str, List[AlertRule]] = defaultdict(list)
+    for rule in rules:
+        by_series[rule.series].append(rule)
+
+    changed: Dict[int, AlertRule] = {}
+    fired: List[AlertRule] = []
+    evaluations: int = 0
+    # Windows only make sense in time order, whatever order the batch has.
+    for sample in sorted(samples, key=operator.attrgetter("timestamp")):
+        for rule in by_series.get(sample.series, ()):
+            evaluations += 1
+            if observe(rule, sample.timestamp, sample.value):
+                fired.append(rule)
+            changed[id(rule)] = rule
+
+    return Evaluation(list(changed.values()), fired, evaluations)
+
+
+def evaluate_ingested(user, samples: List[Sample]) -> Evaluation:
+    """Evaluate a freshly ingested batch and persist the new rule states.
+
+    Must run inside the ingest transaction, on the shard of the user: the
+    rules are locked so that concurrent batches of the same user update
+    their windows one at a time.
+    """
+    using: str = user._state.db
+    series: Set[str] = {sample.series for sample in samples}
+    rules: List[AlertRule] = list(
+        AlertRule.objects.using(using).select_for_update().filter(
+            user=user, series__in=series, is_active=True
+        )
+    )
+    if not rules:
+        return Evaluation([], [], 0)
+
+    result: Evaluation = evaluate(rules, samples)
+    AlertRule.objects.using(using).bulk_update(result.changed, STATE_FIELDS)
+    if result.fired:
+        rule_ids: List[int] = [rule.id for rule in result.fired]
+        transaction.on_commit(lambda: notify(rule_ids, using=using), using=using)
+
+    return result
+
+
+def send_notification(rule_id: int, using: str = "default"):
+    """Email the owner of a rule, stored on the `using` shard, that it fired."""
+    rule = AlertRule.objects.using(using).select_related("user").get(id=rule_id)
+    send_mail(
+        subject=f"Alert: {rule.name}",
+        message=(
+            f"{rule.series} {rule.get_comparison_display()} {rule.threshold} "
+            f"for {rule.duration}, fired at {rule.last_fired_at.isoformat()}."
+        ),
+        from_email=None,
+        recipient_list=[rule.user.email],
+    )
+
+
+def _send_safely(rule_id: int, using: str):
+    """Send a notification from a worker thread, logging any failure."""
+    try:
+        send_notification(rule_id, using)
+    except Exception:
+        logger.exception("Failed to send notification for alert rule %s", rule_id)
+    finally:
+        # Worker threads are not request threads, so nothing else would
+        # close the connection they opened.
+        connections[using].close()
+
+
+_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+    max_workers=settings.ALERT_NOTIFICATION_WORKERS,
+    thread_name_prefix="alert-notifier",
+)
+
+
+def notify(rule_ids: List[int], using: str = "default"):
+    """Send notifications in the background so ingestion never waits on them."""
+    for rule_id in rule_ids:
+        _executor.submit(_send_safely, rule_id, using)
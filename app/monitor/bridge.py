@@ -0,0 +1,141 @@
+"""
+Cross-process delivery of ingested samples through PostgreSQL.
+
+The sample hub only reaches connections of its own process, but in
+production samples are ingested by WSGI workers while streams are held by
+ASGI workers. On PostgreSQL, ingestion therefore sends the samples with
+`NOTIFY`, which is only delivered once the ingest transaction commits, and
+every streaming worker `LISTEN`s on a dedicated connection driven by its
+event loop and republishes them to its local hub.
+"""
+import asyncio
+import json
+import logging
+from typing import Iterator, List, Optional
+
+import psycopg2
+from django.db import connections, transaction
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from monitor.pubsub import SampleHub, hub as default_hub
+
+logger = logging.getLogger(__name__)
+
+CHANNEL: str = "monitor_samples"
+# `NOTIFY` payloads must be shorter than 8000 bytes.
+MAX_PAYLOAD: int = 7500
+# Seconds to wait before reconnecting a lost listening connection.
+RECONNECT_DELAY: float = 1.0
+
+
+def _payloads(user_id: int, samples: List[dict]) -> Iterator[str]:
+    """Split samples into JSON payloads that each fit in a notification."""
+    prefix: str = f'{{"user":{user_id},"samples":['
+    encoded: List[str] = [json.dumps(s, separators=(",", ":")) for s in samples]
+    chunk: List[str] = []
+    size: int = len(prefix) + 2
+    for row in encoded:
+        if chunk and size + len(row) + 1 > MAX_PAYLOAD:
+            yield prefix + ",".join(chunk) + "]}"
+            chunk, size = [], len(prefix) + 2
+        chunk.append(row)
+        size += len(row) + 1
+    if chunk:
+        yield prefix + ",".join(chunk) + "]}"
+
+
+def _notify(user_id: int, samples: List[dict]):
+    # One statement whatever the number of payloads.
+    with connections["default"].cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+            [CHANNEL, list(_payloads(user_id, samples))],
+        )
+
+
+def broadcast(user_id: int, samples: List[dict], using: str = "default"):
+    """Deliver samples to the hub of every worker once the transaction commits.
+
+    :param using: The shard whose transaction stored the samples.
+    """
+    if connections["default"].vendor != "postgresql":
+        # Without a shared database channel only this process can be reached.
+        transaction.on_commit(lambda: default_hub.publish(user_id, samples), using=using)
+    elif using == "default":
+        # Notifications are only delivered if the transaction commits.
+        _notify(user_id, samples)
+    else:
+        # Listeners are connected to the default database, which is not
+        # part of the shard's transaction.
+        transaction.on_commit(lambda: _notify(user_id, samples), using=using)
+
+
+class Listener:
+    """Republish notifications of other processes to a local hub."""
+
+    def __init__(self, hub: Optional[SampleHub] = None, using: str = "default"):
+        self.hub: SampleHub = hub or default_hub
+        self.using: str = using
+        self._connection = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> bool:
+        return self._connection is not None
+
+    def start(self):
+        """Start listening on the running event loop unless already listening."""
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        if connections[self.using].vendor != "postgresql":
+            return
+        # A connection left over from a closed event loop cannot be reused.
+        self.stop()
+        self._loop = loop
+        try:
+            params: dict = connections[self.using].get_connection_params()
+            self._connection = psycopg2.connect(**params)
+            self._connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with self._connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+        except psycopg2.Error:
+            logger.exception("Could not listen for samples, retrying.")
+            self._retry()
+            return
+        loop.add_reader(self._connection.fileno(), self._on_readable)
+
+    def stop(self):
+        """Stop listening and close the connection."""
+        if self._connection is None:
+            return
+        if not self._loop.is_closed() and not self._connection.closed:
+            self._loop.remove_reader(self._connection.fileno())
+        self._connection.close()
+        self._connection = None
+
+    def _retry(self):
+        self.stop()
+        self._loop.call_later(RECONNECT_DELAY, self.start)
+
+    def _on_readable(self):
+        try:
+            self._connection.poll()
+        except psycopg2.Error:
+            logger.exception("Lost the connection listening for samples.")
+            self._retry()
+            return
+
+        while self._connection.notifies:
+            notification = self._connection.notifies.pop(0)
+            try:
+                data: dict = json.loads(notification.payload)
+                self.hub.publish(data["user"], data["samples"])
+            except (ValueError, KeyError):
+                logger.warning(
+                    "Ignoring malformed notification %r.", notification.payload
+                )
+
+
+# The listener feeding the hub of this worker.
+listener: Listener = Listener()
@@ -0,0 +1,43 @@
+"""
+Ingestion of batches of monitoring samples.
+"""
+from typing import List
+
+from django.db import transaction
+
+from core.models import Sample
+from monitor.alerts import evaluate_ingested
+from monitor.bridge import broadcast
+
+
+def ingest_samples(user, rows: List[dict]) -> List[Sample]:
+    """Store a batch of validated samples for a user and publish them.
+
+    The batch is stored on the shard the user was loaded from, and is also
+    evaluated against the user's alert rules in the same transaction, so a
+    rule's window never gets ahead of the stored samples.
+
+    :param user: Owner of the samples.
+    :param rows: Dictionaries with `series`, `timestamp` and `value` keys.
+    :return: The created samples.
+    """
+    using: str = user._state.db
+    with transaction.atomic(using=using):
+        samples: List[Sample] = Sample.objects.using(using).bulk_create(
+            [Sample(user=user, **row) for row in rows]
+        )
+        evaluate_ingested(user, samples)
+
+        payload: List[dict] = [
+            {
+                "series": sample.series,
+                "timestamp": sample.timestamp.isoformat(),
+                "value": sample.value,
+            }
+            for sample in samples
+        ]
+        # Subscribers must never see samples that end up being rolled back,
+        # so the fan-out only happens once the batch is committed.
+        broadcast(user.id, payload, using=using)
+
+    return samples
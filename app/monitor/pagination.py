@@ -0,0 +1,145 @@
+"""
+Pagination classes for the monitoring API.
+"""
+import heapq
+from base64 import b64decode, b64encode
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class SampleCursorPagination(BasePagination):
+    """Keyset pagination of samples on their timestamp, forward only.
+
+    Samples come from both the database and cold storage, so pages are not
+    cut from a single queryset. The cursor holds the timestamp of the last
+    sample of the previous page and how many samples sharing it were
+    already returned. Each page then reads at most that many samples plus
+    one page from each source, starting at that timestamp, whatever the
+    depth and the length of the user's history.
+    """
+
+    page_size: int = settings.SAMPLE_LIST_PAGE_SIZE
+    page_size_query_param: str = "page_size"
+    max_page_size: int = settings.SAMPLE_LIST_MAX_PAGE_SIZE
+    cursor_query_param: str = "cursor"
+    invalid_cursor_message: str = _("Invalid cursor")
+
+    def get_page_size(self, request: Request) -> int:
+        """Return the requested page size, within the allowed bounds."""
+        try:
+            size: int = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request: Request) -> Optional[Tuple[datetime, int]]:
+        """Return the position of the requested page, `None` for the first."""
+        encoded: Optional[str] = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            fields: dict = parse_qs(
+                b64decode(encoded.encode()).decode(), strict_parsing=True
+            )
+            timestamp: Optional[datetime] = parse_datetime(fields["t"][0])
+            skip: int = int(fields["s"][0])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None or skip < 0:
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, skip
+
+    def encode_cursor(self, timestamp: datetime, skip: int) -> str:
+        """Return the cursor of the page following a position."""
+        query: str = urlencode({"t": timestamp.isoformat(), "s": skip})
+        return b64encode(query.encode()).decode()
+
+    def paginate(
+        self,
+        request: Request,
+        cold: Callable[[Optional[datetime], int], Iterable],
+        hot,
+    ) -> List:
+        """Return the samples of the requested page.
+
+        :param cold: Called with the start of the page and the number of
+            samples needed, returns the cold samples from there, oldest first.
+        :param hot: Queryset of the samples in the database, oldest first.
+        """
+        self.request = request
+        page_size: int = self.get_page_size(request)
+        position: Optional[Tuple[datetime, int]] = self.decode_cursor(request)
+        after, skip = position or (None, 0)
+        # One more sample than the page tells whether there is a next one.
+        needed: int = skip + page_size + 1
+        if after is not None:
+            hot = hot.filter(timestamp__gte=after)
+        samples: list = list(
+            islice(
+                heapq.merge(
+                    cold(after, needed), hot[:needed], key=attrgetter("timestamp")
+                ),
+                skip,
+                needed,
+            )
+        )
+
+        self.next_cursor: Optional[str] = None
+        if len(samples) > page_size:
+            samples = samples[:page_size]
+            last: datetime = samples[-1].timestamp
+            ties: int = sum(sample.timestamp == last for sample in samples)
+            # Samples sharing a timestamp may span several pages.
+            if last == after:
+                ties += skip
+            self.next_cursor = self.encode_cursor(last, ties)
+        return samples
+
+    def get_next_link(self) -> Optional[str]:
+        """Return the URL of the next page, if any."""
+        if self.next_cursor is None:
+            return None
+        url: str = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view) -> list:
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
@@ -0,0 +1,156 @@
+"""
+In-process publish/subscribe hub for newly ingested samples.
+
+Samples are published from the (synchronous) ingest path, which may run in
+any thread, and consumed by streaming connections that live on an asyncio
+event loop. Every subscriber owns a bounded buffer so that a slow consumer
+can never make the worker's memory grow: once its buffer is full the oldest
+frame is dropped and the drop is reported to the client, which can backfill
+the gap through the REST API.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+
+# Comment frame sent on idle streams so that proxies keep them open.
+KEEPALIVE: bytes = b": keepalive\n\n"
+
+
+def encode_event(data: dict, event: Optional[str] = None) -> bytes:
+    """Encode a payload as a single Server-Sent Events frame."""
+    # Compact separators keep frames small as they are fanned out to every
+    # subscriber of a user.
+    body: str = json.dumps(data, separators=(",", ":"))
+    prefix: str = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {body}\n\n".encode()
+
+
+class Subscription:
+    """A single consumer of a user's samples, bound to one event loop."""
+
+    def __init__(
+        self,
+        user_id: int,
+        series: Optional[Set[str]],
+        loop: asyncio.AbstractEventLoop,
+        max_buffer: int,
+    ):
+        self.user_id: int = user_id
+        # `None` means that the subscriber wants every series.
+        self.series: Optional[Set[str]] = series
+        self.loop: asyncio.AbstractEventLoop = loop
+        self.dropped: int = 0
+        # A `deque` with `maxlen` discards the oldest frame on overflow in
+        # O(1), which is exactly the backpressure policy we want.
+        self._frames: deque = deque(maxlen=max_buffer)
+        self._ready: asyncio.Event = asyncio.Event()
+
+    def wants(self, series: str) -> bool:
+        """Return whether the subscriber is interested in a series."""
+        return self.series is None or series in self.series
+
+    def offer(self, frame: bytes):
+        """Buffer a frame. Must be called from the subscriber's event loop."""
+        if len(self._frames) == self._frames.maxlen:
+            self.dropped += 1
+        self._frames.append(frame)
+        self._ready.set()
+
+    def keepalive(self):
+        """Queue a keepalive comment if nothing is waiting to be sent."""
+        if not self._frames:
+            self.offer(KEEPALIVE)
+
+    async def get(self) -> bytes:
+        """Wait for frames and return everything buffered as one chunk."""
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        # Draining the whole buffer in one write lets a client that fell
+        # behind catch up with a single `send` instead of one per frame.
+        chunk: bytes = b"".join(self._frames)
+        self._frames.clear()
+        if self.dropped:
+            # Tell the client how much it missed before resuming the stream.
+            dropped, self.dropped = self.dropped, 0
+            chunk = encode_event({"dropped": dropped}, event="overflow") + chunk
+        return chunk
+
+
+class SampleHub:
+    """Fan out ingested samples to the subscriptions of their owner."""
+
+    def __init__(self, max_buffer: Optional[int] = None):
+        self.max_buffer: int = max_buffer or settings.MONITOR_STREAM_BUFFER_SIZE
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        # Publishing happens in request threads while subscribing happens on
+        # the event loop, so the registry must be guarded.
+        self._lock: threading.Lock = threading.Lock()
+
+    def subscribe(
+        self, user_id: int, series: Optional[Iterable[str]] = None
+    ) -> Subscription:
+        """Register a subscription on the running event loop."""
+        subscription = Subscription(
+            user_id=user_id,
+            series=set(series) if series else None,
+            loop=asyncio.get_running_loop(),
+            max_buffer=self.max_buffer,
+        )
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription. Unknown subscriptions are ignored."""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def connection_count(self) -> int:
+        """Return the number of open subscriptions in this process."""
+        with self._lock:
+            return sum(len(subs) for subs in self._subscriptions.values())
+
+    def publish(self, user_id: int, samples: List[dict]):
+        """Publish samples of a user. Safe to call from any thread."""
+        with self._lock:
+            subscriptions: List[Subscription] = list(
+                self._subscriptions.get(user_id, ())
+            )
+        if not subscriptions:
+            return
+
+        # Encode each series once and share the bytes between subscribers
+        # so that fan-out costs a reference per connection, not a copy.
+        by_series: Dict[str, List[dict]] = {}
+        for sample in samples:
+            by_series.setdefault(sample["series"], []).append(sample)
+        frames: Dict[str, bytes] = {
+            series: encode_event({"series": series, "samples": rows})
+            for series, rows in by_series.items()
+        }
+
+        for subscription in subscriptions:
+            for series, frame in frames.items():
+                if not subscription.wants(series):
+                    continue
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, frame)
+                except RuntimeError:
+                    # The subscriber's loop has been closed; it will be
+                    # unsubscribed by its own connection handler.
+                    break
+
+
+# The hub shared by every connection and request handled by this worker.
+hub: SampleHub = SampleHub()
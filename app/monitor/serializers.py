@@ -0,0 +1,42 @@
+"""
+Serializers for the monitoring API.
+"""
+from rest_framework import serializers
+
+from core.models import AlertRule, Sample
+
+
+class SampleSerializer(serializers.ModelSerializer):
+    """Serializer for a single sample of a monitored series."""
+
+    class Meta:
+        model = Sample
+        fields: list = ["series", "timestamp", "value"]
+
+
+class AlertRuleSerializer(serializers.ModelSerializer):
+    """Serializer for alert rules."""
+
+    class Meta:
+        model = AlertRule
+        fields: list = [
+            "id",
+            "name",
+            "series",
+            "comparison",
+            "threshold",
+            "duration",
+            "is_active",
+            "firing",
+            "last_fired_at",
+        ]
+        # The state of a rule is owned by the evaluation engine.
+        read_only_fields: list = ["id", "firing", "last_fired_at"]
+
+    def update(self, instance: AlertRule, validated_data: dict) -> AlertRule:
+        """Update a rule, restarting its window if its condition changed."""
+        condition: set = {"series", "comparison", "threshold", "duration"}
+        if condition & validated_data.keys():
+            instance.breach_started_at = None
+            instance.firing = False
+        return super().update(instance, validated_data)
@@ -0,0 +1,168 @@
+"""
+Server-Sent Events endpoint pushing newly ingested samples to clients.
+
+Django 3.2 cannot stream asynchronously from a view, so the endpoint is a
+small ASGI application mounted next to Django in `app/asgi.py`. Clients
+authenticate with the same DRF tokens as the REST API, either through the
+`Authorization: Token <key>` header or, because browsers' `EventSource`
+cannot set headers, a `token` query parameter.
+"""
+import asyncio
+from typing import Optional
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signals
+
+from core.authentication import get_token
+from monitor.bridge import Listener, listener as default_listener
+from monitor.pubsub import SampleHub, Subscription, hub as default_hub
+
+STREAM_PATH: str = "/api/monitor/stream/"
+
+
+def _authenticate(key: str) -> Optional[int]:
+    """Return the id of the active user owning a token, if any."""
+    # Mirror Django's own handler so that database connections opened for
+    # the lookup are cleaned up like they would be for a regular request.
+    signals.request_started.send(sender=SampleStreamApp)
+    try:
+        token = get_token(key)
+    finally:
+        signals.request_finished.send(sender=SampleStreamApp)
+
+    if token is None or not token.user.is_active:
+        return None
+    return token.user.id
+
+
+class SampleStreamApp:
+    """ASGI application streaming a user's samples as Server-Sent Events."""
+
+    def __init__(
+        self, hub: Optional[SampleHub] = None, listener: Optional[Listener] = None
+    ):
+        self.hub: SampleHub = hub or default_hub
+        # Samples ingested by other processes reach the hub through this.
+        self.listener: Listener = listener or default_listener
+
+    async def __call__(self, scope: dict, receive, send):
+        if scope["method"] != "GET":
+            await self._reject(send, 405, b"Method not allowed.")
+            return
+
+        query: dict = parse_qs(scope["query_string"].decode())
+        key: Optional[str] = self._token(scope, query)
+        user_id: Optional[int] = None
+        if key:
+            user_id = await sync_to_async(_authenticate)(key)
+        if user_id is None:
+            await self._reject(send, 401, b"Invalid or missing token.")
+            return
+        if self.hub.connection_count() >= settings.MONITOR_STREAM_MAX_CONNECTIONS:
+            await self._reject(send, 503, b"Too many open streams.")
+            return
+
+        self.listener.start()
+        series: list = [
+            s for value in query.get("series", []) for s in value.split(",")
+        ]
+        subscription: Subscription = self.hub.subscribe(user_id, series)
+        try:
+            await self._stream(subscription, receive, send)
+        finally:
+            self.hub.unsubscribe(subscription)
+
+    @staticmethod
+    def _token(scope: dict, query: dict) -> Optional[str]:
+        """Extract the token key from the headers or the query string."""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                parts: list = value.decode().split()
+                if len(parts) == 2 and parts[0].lower() == "token":
+                    return parts[1]
+                return None
+
+        keys: list = query.get("token", [])
+        return keys[0] if keys else None
+
+    @staticmethod
+    async def _reject(send, status: int, body: bytes):
+        """Send a plain-text error response."""
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        """Consume client messages until it disconnects."""
+        while True:
+            message: dict = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    async def _pump(self, subscription: Subscription, send):
+        """Forward frames of a subscription to the client forever."""
+        loop = asyncio.get_running_loop()
+        heartbeat: float = settings.MONITOR_STREAM_HEARTBEAT
+        handle = None
+
+        def beat():
+            nonlocal handle
+            subscription.keepalive()
+            handle = loop.call_later(heartbeat, beat)
+
+        handle = loop.call_later(heartbeat, beat)
+        try:
+            while True:
+                chunk: bytes = await subscription.get()
+                # `send` waits while the transport's write buffer is full, so
+                # a slow client stalls here and its bounded buffer absorbs
+                # (and eventually drops) whatever is published meanwhile.
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+        finally:
+            handle.cancel()
+
+    async def _stream(self, subscription: Subscription, receive, send):
+        """Stream a subscription to the client until it disconnects."""
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    # Stop reverse proxies such as nginx from buffering events.
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b": connected\n\n",
+                "more_body": True,
+            }
+        )
+
+        # Waiting on both tasks once per connection, rather than once per
+        # frame, keeps the per-frame cost down to a single buffer drain.
+        pump = asyncio.ensure_future(self._pump(subscription, send))
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            await asyncio.wait(
+                {pump, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            pump.cancel()
+            disconnected.cancel()
+        if pump.done() and not pump.cancelled() and pump.exception():
+            raise pump.exception()
@@ -0,0 +1,268 @@
+"""
+Tests for the alert rule engine and API.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core.authentication import get_or_create_token
+from core.budgets import QueryBudgetTestMixin
+from core.models import AlertRule, Sample
+from monitor import alerts
+from monitor.views import AlertRuleDetailView, AlertRuleListView
+
+
+ALERT_RULES_URL: str = reverse("monitor:alert-rules")
+SAMPLES_URL: str = reverse("monitor:samples")
+START: datetime = datetime(2022, 9, 1, tzinfo=timezone.utc)
+
+
+def heart_rate_rule(**kwargs) -> AlertRule:
+    """Return an unsaved "heart_rate > 150 for 5 minutes" rule."""
+    defaults: dict = {
+        "name": "High heart rate",
+        "series": "heart_rate",
+        "comparison": AlertRule.GREATER_THAN,
+        "threshold": 150,
+        "duration": timedelta(minutes=5),
+    }
+    defaults.update(kwargs)
+    return AlertRule(**defaults)
+
+
+def samples(values: list, series: str = "heart_rate") -> list:
+    """Return unsaved samples one minute apart."""
+    return [
+        Sample(series=series, timestamp=START + timedelta(minutes=i), value=value)
+        for i, value in enumerate(values)
+    ]
+
+
+class EvaluateTests(SimpleTestCase):
+    """Test the incremental evaluation of rules."""
+
+    def test_fires_after_duration(self):
+        """Test that a rule fires once its threshold held long enough."""
+        rule: AlertRule = heart_rate_rule()
+
+        result = alerts.evaluate([rule], samples([160] * 5))
+        self.assertEqual(result.fired, [])
+        self.assertFalse(rule.firing)
+
+        # The state carries over, so the next batch completes the window.
+        result = alerts.evaluate([rule], samples([160] * 7)[5:])
+        self.assertEqual(result.fired, [rule])
+        self.assertEqual(rule.last_fired_at, START + timedelta(minutes=5))
+
+    def test_fires_once_per_breach(self):
+        """Test that a firing rule only fires again after it recovered."""
+        rule: AlertRule = heart_rate_rule(duration=timedelta(minutes=1))
+
+        result = alerts.evaluate([rule], samples([160, 160, 160, 100, 160, 160]))
+
+        self.assertEqual(len(result.fired), 2)
+
+    def test_recovery_resets_window(self):
+        """Test that a sample within the threshold resets the window."""
+        rule: AlertRule = heart_rate_rule()
+
+        result = alerts.evaluate([rule], samples([160, 160, 160, 140, 160, 160, 160]))
+
+        self.assertEqual(result.fired, [])
+        self.assertEqual(rule.breach_started_at, START + timedelta(minutes=4))
+
+    def test_unordered_and_late_samples(self):
+        """Test that batches are evaluated in time order and late data ignored."""
+        rule: AlertRule = heart_rate_rule(duration=timedelta(minutes=2))
+
+        alerts.evaluate([rule], list(reversed(samples([160, 160, 160]))))
+        self.assertTrue(rule.firing)
+
+        # A low sample older than the window must not resolve the alert.
+        alerts.evaluate([rule], samples([100]))
+        self.assertTrue(rule.firing)
+
+    def test_only_matching_series_evaluated(self):
+        """Test that samples only touch the rules of their series."""
+        heart_rate: AlertRule = heart_rate_rule()
+        steps: AlertRule = heart_rate_rule(series="steps")
+
+        result = alerts.evaluate([heart_rate, steps], samples([160, 160, 160]))
+
+        self.assertEqual(result.evaluations, 3)
+        self.assertEqual(result.changed, [heart_rate])
+
+
+class IngestAlertTests(TestCase):
+    """Test rules being evaluated as samples are ingested."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def ingest(self, values: list):
+        """Ingest heart rate samples one minute apart from `START`."""
+        payload: list = [
+            {"series": s.series, "timestamp": s.timestamp.isoformat(), "value": s.value}
+            for s in samples(values)
+        ]
+        self.client.post(SAMPLES_URL, payload, format="json")
+
+    @patch("monitor.alerts.notify")
+    def test_state_persisted_and_notified(self, patched_notify):
+        """Test that a rule fires across batches and notifies its owner."""
+        rule: AlertRule = heart_rate_rule(user=self.user)
+        rule.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingest([160] * 3)
+        rule.refresh_from_db()
+        self.assertEqual(rule.breach_started_at, START)
+        patched_notify.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingest([160] * 7)
+        rule.refresh_from_db()
+        self.assertTrue(rule.firing)
+        patched_notify.assert_called_once_with([rule.id], using="default")
+
+    @patch("monitor.alerts.notify")
+    def test_other_users_rules_untouched(self, patched_notify):
+        """Test that a batch is only evaluated against its owner's rules."""
+        other = get_user_model().objects.create_user(email="other@example.com")
+        rule: AlertRule = heart_rate_rule(user=other, duration=timedelta(0))
+        rule.save()
+
+        self.ingest([160])
+
+        rule.refresh_from_db()
+        self.assertIsNone(rule.last_sample_at)
+
+    def test_send_notification(self):
+        """Test that the owner of a fired rule is emailed."""
+        rule: AlertRule = heart_rate_rule(user=self.user, last_fired_at=START)
+        rule.save()
+
+        alerts.send_notification(rule.id)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertIn(rule.name, mail.outbox[0].subject)
+
+
+class AlertRuleAPITests(TestCase):
+    """Test the alert rule API."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_rule(self):
+        """Test creating a rule for the authenticated user."""
+        payload: dict = {
+            "name": "High heart rate",
+            "series": "heart_rate",
+            "comparison": "gt",
+            "threshold": 150,
+            "duration": "00:05:00",
+        }
+
+        res: Response = self.client.post(ALERT_RULES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        rule: AlertRule = AlertRule.objects.get(id=res.data["id"])
+        self.assertEqual(rule.user, self.user)
+        self.assertEqual(rule.duration, timedelta(minutes=5))
+
+    def test_rules_limited_to_user(self):
+        """Test that users only see their own rules."""
+        other = get_user_model().objects.create_user(email="other@example.com")
+        heart_rate_rule(user=other).save()
+        own: AlertRule = heart_rate_rule(user=self.user)
+        own.save()
+
+        res: Response = self.client.get(ALERT_RULES_URL)
+
+        self.assertEqual([rule["id"] for rule in res.data], [own.id])
+
+    def test_changing_condition_resets_state(self):
+        """Test that editing the condition of a rule restarts its window."""
+        rule: AlertRule = heart_rate_rule(
+            user=self.user, firing=True, breach_started_at=START
+        )
+        rule.save()
+        url: str = reverse("monitor:alert-rule-detail", args=[rule.id])
+
+        res: Response = self.client.patch(url, {"threshold": 170})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rule.refresh_from_db()
+        self.assertFalse(rule.firing)
+        self.assertIsNone(rule.breach_started_at)
+
+
+class AlertRuleAPIBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Test that the alert rule API stays within its query budgets."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com", password="testpass123"
+        )
+        # More than one rule, so that N+1 queries would show.
+        self.rules: list = [heart_rate_rule(user=self.user) for _ in range(3)]
+        for rule in self.rules:
+            rule.save()
+        # Authenticating with a real token, finding the user's shard again.
+        cache.clear()
+        self.client = APIClient()
+        token = get_or_create_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_list_and_create_budgets(self):
+        """Test the queries of listing and creating rules."""
+        budgets: dict = AlertRuleListView.query_budgets
+        payload: dict = {
+            "name": "Low heart rate",
+            "series": "heart_rate",
+            "comparison": "lt",
+            "threshold": 40,
+            "duration": "00:05:00",
+        }
+
+        with self.assertWithinBudget(budgets["GET"]):
+            self.client.get(ALERT_RULES_URL)
+        cache.clear()
+        with self.assertWithinBudget(budgets["POST"]):
+            res: Response = self.client.post(ALERT_RULES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_detail_budgets(self):
+        """Test the queries of retrieving, updating and deleting a rule."""
+        budgets: dict = AlertRuleDetailView.query_budgets
+        url: str = reverse("monitor:alert-rule-detail", args=[self.rules[0].id])
+
+        with self.assertWithinBudget(budgets["GET"]):
+            self.client.get(url)
+        cache.clear()
+        with self.assertWithinBudget(budgets["PATCH"]):
+            self.client.patch(url, {"threshold": 170})
+        cache.clear()
+        with self.assertWithinBudget(budgets["DELETE"]):
+            res: Response = self.client.delete(url)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,79 @@
+"""
+Tests for the cross-process delivery of samples.
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from monitor import bridge
+from monitor.ingest import ingest_samples
+from monitor.pubsub import SampleHub
+
+
+ROW: dict = {
+    "series": "heart_rate",
+    "timestamp": datetime(2022, 9, 1, tzinfo=timezone.utc),
+    "value": 70.0,
+}
+
+
+class PayloadTests(SimpleTestCase):
+    """Test splitting samples into notification payloads."""
+
+    def test_large_batches_are_split(self):
+        """Test that every payload fits in a notification and none is lost."""
+        samples: list = [{"series": "heart_rate", "value": i} for i in range(2000)]
+
+        payloads: list = list(bridge._payloads(7, samples))
+
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(p) <= bridge.MAX_PAYLOAD for p in payloads))
+        decoded: list = [json.loads(p) for p in payloads]
+        self.assertTrue(all(d["user"] == 7 for d in decoded))
+        self.assertEqual(sum((d["samples"] for d in decoded), []), samples)
+
+
+@skipIf(connection.vendor == "postgresql", "Uses notifications on PostgreSQL.")
+class LocalBroadcastTests(TestCase):
+    """Test the in-process fallback used by other databases."""
+
+    @patch("monitor.bridge.default_hub")
+    def test_published_on_commit(self, patched_hub):
+        """Test that samples are published locally once committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            bridge.broadcast(1, [{"series": "heart_rate"}])
+
+        patched_hub.publish.assert_called_once_with(1, [{"series": "heart_rate"}])
+
+
+@skipUnless(connection.vendor == "postgresql", "Notifications require PostgreSQL.")
+class ListenerTests(TransactionTestCase):
+    """Test delivering committed samples through PostgreSQL notifications."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="test@example.com")
+        self.hub = SampleHub(max_buffer=10)
+        self.listener = bridge.Listener(hub=self.hub)
+
+    def tearDown(self):
+        self.listener.stop()
+
+    def test_committed_samples_reach_listener(self):
+        """Test that samples ingested elsewhere reach the local hub."""
+
+        async def run():
+            self.listener.start()
+            subscription = self.hub.subscribe(self.user.id)
+            await sync_to_async(ingest_samples)(self.user, [ROW])
+            return await asyncio.wait_for(subscription.get(), timeout=5)
+
+        frame: bytes = async_to_sync(run)()
+
+        self.assertIn(b'"value":70.0', frame)
@@ -0,0 +1,234 @@
+"""
+Tests for the sample ingestion and query API.
+"""
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core import cold_storage
+from core.authentication import get_or_create_token
+from core.budgets import QueryBudgetTestMixin
+from core.models import AlertRule, Sample
+from monitor.views import SampleView
+
+
+SAMPLES_URL: str = reverse("monitor:samples")
+START: datetime = datetime(2022, 9, 1, tzinfo=timezone.utc)
+
+
+def create_user(**kwargs):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**kwargs)
+
+
+def sample_payload(count: int, series: str = "heart_rate") -> list:
+    """Return a batch of `count` samples one minute apart."""
+    return [
+        {
+            "series": series,
+            "timestamp": (START + timedelta(minutes=i)).isoformat(),
+            "value": 60.0 + i,
+        }
+        for i in range(count)
+    ]
+
+
+class PublicSampleAPITests(TestCase):
+    """Test unauthenticated requests to the sample API."""
+
+    def test_auth_required(self):
+        """Test that authentication is required to ingest samples."""
+        res: Response = APIClient().post(SAMPLES_URL, sample_payload(1), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSampleAPITests(TestCase):
+    """Test authenticated requests to the sample API."""
+
+    def setUp(self):
+        self.user = create_user(email="test@example.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_ingest_batch(self):
+        """Test that a batch of samples is stored for the user."""
+        res: Response = self.client.post(SAMPLES_URL, sample_payload(3), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {"ingested": 3})
+        self.assertEqual(Sample.objects.filter(user=self.user).count(), 3)
+
+    def test_invalid_batch_stores_nothing(self):
+        """Test that one invalid sample rejects the whole batch."""
+        payload: list = sample_payload(2)
+        payload[1]["value"] = "not-a-number"
+
+        res: Response = self.client.post(SAMPLES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Sample.objects.exists())
+
+    def test_ingest_retry_not_duplicated(self):
+        """Test that a batch retried with the same key is stored once."""
+        for _ in range(2):
+            res: Response = self.client.post(
+                SAMPLES_URL,
+                sample_payload(3),
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="batch-1",
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {"ingested": 3})
+        self.assertEqual(Sample.objects.count(), 3)
+
+    @patch("monitor.ingest.broadcast")
+    def test_ingest_broadcasts_samples(self, patched_broadcast):
+        """Test that ingested samples are handed over for delivery."""
+        self.client.post(SAMPLES_URL, sample_payload(2), format="json")
+
+        patched_broadcast.assert_called_once()
+        user_id, published = patched_broadcast.call_args.args
+        self.assertEqual(user_id, self.user.id)
+        self.assertEqual([row["value"] for row in published], [60.0, 61.0])
+
+    def test_list_filters_by_range_and_series(self):
+        """Test that only the user's samples in the range are returned."""
+        self.client.post(SAMPLES_URL, sample_payload(5), format="json")
+        self.client.post(SAMPLES_URL, sample_payload(5, series="steps"), format="json")
+        other = create_user(email="other@example.com", password="testpass123")
+        Sample.objects.create(user=other, series="heart_rate", timestamp=START, value=1)
+
+        res: Response = self.client.get(
+            SAMPLES_URL,
+            {
+                "series": "heart_rate",
+                "start": (START + timedelta(minutes=1)).isoformat(),
+                "end": (START + timedelta(minutes=3)).isoformat(),
+            },
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["value"] for row in res.data["results"]], [61.0, 62.0])
+        self.assertIsNone(res.data["next"])
+
+    def test_list_merges_cold_storage(self):
+        """Test that old samples in cold storage are returned with recent ones."""
+        self.client.post(SAMPLES_URL, sample_payload(2), format="json")
+        old: datetime = START - timedelta(days=40)
+        with tempfile.TemporaryDirectory() as directory:
+            cold_storage.write_file(
+                Path(directory) / f"core_sample_p{old:%Y_%m}{cold_storage.SUFFIX}",
+                old - timedelta(days=1),
+                old + timedelta(days=1),
+                [(self.user.id, "heart_rate", old, 50.0)],
+            )
+            with override_settings(COLD_STORAGE_DIR=directory):
+                res: Response = self.client.get(SAMPLES_URL, {"series": "heart_rate"})
+
+        self.assertEqual(
+            [row["value"] for row in res.data["results"]], [50.0, 60.0, 61.0]
+        )
+
+    def test_list_paginated_across_cold_storage(self):
+        """Test that pages follow each other through cold and hot samples."""
+        self.client.post(SAMPLES_URL, sample_payload(3), format="json")
+        # Two samples share the timestamp of the last cold one.
+        Sample.objects.create(user=self.user, series="steps", timestamp=START, value=1)
+        old: datetime = START - timedelta(days=40)
+        cold_rows: list = [
+            (self.user.id, "heart_rate", old + timedelta(minutes=i), 50.0 + i)
+            for i in range(3)
+        ]
+        pages: list = []
+        with tempfile.TemporaryDirectory() as directory:
+            cold_storage.write_file(
+                Path(directory) / f"core_sample_p{old:%Y_%m}{cold_storage.SUFFIX}",
+                old - timedelta(days=1),
+                old + timedelta(days=1),
+                cold_rows,
+            )
+            with override_settings(COLD_STORAGE_DIR=directory):
+                url: str = f"{SAMPLES_URL}?page_size=2"
+                while url:
+                    res: Response = self.client.get(url)
+                    self.assertEqual(res.status_code, status.HTTP_200_OK)
+                    pages.append([row["value"] for row in res.data["results"]])
+                    url = res.data["next"]
+
+        self.assertEqual(pages, [[50.0, 51.0], [52.0, 60.0], [1.0, 61.0], [62.0]])
+
+    def test_list_invalid_cursor_error(self):
+        """Test that a malformed cursor is rejected."""
+        res: Response = self.client.get(SAMPLES_URL, {"cursor": "nonsense"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_invalid_bound_error(self):
+        """Test that a malformed range bound is rejected."""
+        res: Response = self.client.get(SAMPLES_URL, {"start": "yesterday"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SampleAPIBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Test that the sample API stays within its query budgets."""
+
+    def setUp(self):
+        self.user = create_user(email="test@example.com", password="testpass123")
+        # Several rules watch the ingested series, so that per-rule queries show.
+        for threshold in (100, 150, 200):
+            AlertRule.objects.create(
+                user=self.user,
+                name=f"Above {threshold}",
+                series="heart_rate",
+                comparison=AlertRule.GREATER_THAN,
+                threshold=threshold,
+                duration=timedelta(minutes=1),
+            )
+        # Authenticating with a real token, finding the user's shard again.
+        cache.clear()
+        self.client = APIClient()
+        token = get_or_create_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_ingest_budget(self):
+        """Test the queries of ingesting a batch, whatever its size."""
+        # Large enough to be split into several notifications.
+        with self.assertWithinBudget(SampleView.query_budgets["POST"]):
+            res: Response = self.client.post(
+                SAMPLES_URL, sample_payload(200), format="json"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_list_budget(self):
+        """Test that listing samples takes the same queries at any depth."""
+        self.client.post(SAMPLES_URL, sample_payload(5), format="json")
+        old: datetime = START - timedelta(days=40)
+        budget = SampleView.query_budgets["GET"]
+        with tempfile.TemporaryDirectory() as directory:
+            cold_storage.write_file(
+                Path(directory) / f"core_sample_p{old:%Y_%m}{cold_storage.SUFFIX}",
+                old - timedelta(days=1),
+                old + timedelta(days=1),
+                [(self.user.id, "heart_rate", old, 50.0)],
+            )
+            with override_settings(COLD_STORAGE_DIR=directory):
+                cache.clear()
+                with self.assertWithinBudget(budget):
+                    res: Response = self.client.get(SAMPLES_URL, {"page_size": 2})
+                with self.assertWithinBudget(budget):
+                    self.client.get(res.data["next"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,187 @@
+"""
+Tests for the in-process pub/sub hub and the Server-Sent Events stream.
+"""
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from monitor.bridge import Listener
+from monitor.pubsub import KEEPALIVE, SampleHub
+from monitor.stream import STREAM_PATH, SampleStreamApp
+
+
+SAMPLE: dict = {"series": "heart_rate", "timestamp": "2022-09-01T00:00:00", "value": 70}
+
+
+def decode(frame: bytes) -> dict:
+    """Return the JSON payload of a Server-Sent Events frame."""
+    data: str = frame.decode().split("data: ", 1)[1]
+    return json.loads(data)
+
+
+class SampleHubTests(SimpleTestCase):
+    """Test the sample hub."""
+
+    def test_publish_reaches_subscriber(self):
+        """Test that samples are delivered to the owner's subscribers only."""
+        hub = SampleHub(max_buffer=10)
+
+        async def run():
+            owner = hub.subscribe(user_id=1)
+            stranger = hub.subscribe(user_id=2)
+            hub.publish(1, [SAMPLE])
+            frame: bytes = await asyncio.wait_for(owner.get(), timeout=1)
+            self.assertEqual(
+                decode(frame), {"series": "heart_rate", "samples": [SAMPLE]}
+            )
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(stranger.get(), timeout=0.05)
+
+        async_to_sync(run)()
+
+    def test_series_filter(self):
+        """Test that subscribers only receive the series they asked for."""
+        hub = SampleHub(max_buffer=10)
+
+        async def run():
+            subscription = hub.subscribe(user_id=1, series=["steps"])
+            hub.publish(1, [SAMPLE, dict(SAMPLE, series="steps")])
+            frame: bytes = await asyncio.wait_for(subscription.get(), timeout=1)
+            self.assertEqual(decode(frame)["series"], "steps")
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(subscription.get(), timeout=0.05)
+
+        async_to_sync(run)()
+
+    def test_slow_consumer_buffer_is_bounded(self):
+        """Test that a full buffer drops the oldest frames and reports it."""
+        hub = SampleHub(max_buffer=2)
+
+        async def run():
+            subscription = hub.subscribe(user_id=1)
+            for value in range(5):
+                hub.publish(1, [dict(SAMPLE, value=value)])
+            # Let the thread-safe callbacks run.
+            await asyncio.sleep(0)
+
+            frames: list = (await subscription.get()).split(b"\n\n")[:-1]
+            self.assertTrue(frames[0].startswith(b"event: overflow\n"))
+            self.assertEqual(decode(frames[0]), {"dropped": 3})
+            values: list = [
+                decode(frame)["samples"][0]["value"] for frame in frames[1:]
+            ]
+            self.assertEqual(values, [3, 4])
+
+        async_to_sync(run)()
+
+    def test_keepalive_only_when_idle(self):
+        """Test that keepalives are not queued behind pending frames."""
+        hub = SampleHub(max_buffer=2)
+
+        async def run():
+            subscription = hub.subscribe(user_id=1)
+            subscription.keepalive()
+            self.assertEqual(await subscription.get(), KEEPALIVE)
+            hub.publish(1, [SAMPLE])
+            await asyncio.sleep(0)
+            subscription.keepalive()
+            self.assertTrue((await subscription.get()).startswith(b"data"))
+
+        async_to_sync(run)()
+
+    def test_unsubscribe(self):
+        """Test that unsubscribed connections are no longer counted."""
+        hub = SampleHub(max_buffer=2)
+
+        async def run():
+            subscription = hub.subscribe(user_id=1)
+            self.assertEqual(hub.connection_count(), 1)
+            hub.unsubscribe(subscription)
+            self.assertEqual(hub.connection_count(), 0)
+
+        async_to_sync(run)()
+
+
+# The stream authenticates in a worker thread outside of the test's
+# transaction, so the data it reads must actually be committed.
+class SampleStreamTests(TransactionTestCase):
+    """Test the Server-Sent Events endpoint."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com", password="testpass123"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.hub = SampleHub(max_buffer=10)
+        self.listener = Listener(hub=self.hub)
+        self.app = SampleStreamApp(hub=self.hub, listener=self.listener)
+
+    def tearDown(self):
+        self.listener.stop()
+
+    def request(self, query_string: bytes = b"", headers: list = None) -> list:
+        """Open a stream, publish one sample, disconnect and return messages."""
+        scope: dict = {
+            "type": "http",
+            "method": "GET",
+            "path": STREAM_PATH,
+            "query_string": query_string,
+            "headers": headers or [],
+        }
+        messages: list = []
+
+        async def run():
+            inbox: asyncio.Queue = asyncio.Queue()
+
+            async def send(message: dict):
+                messages.append(message)
+
+            task = asyncio.ensure_future(self.app(scope, inbox.get, send))
+            for _ in range(100):
+                if task.done() or self.hub.connection_count():
+                    break
+                await asyncio.sleep(0.01)
+            self.hub.publish(self.user.id, [SAMPLE])
+            await asyncio.sleep(0.05)
+            await inbox.put({"type": "http.disconnect"})
+            await asyncio.wait_for(task, timeout=1)
+
+        async_to_sync(run)()
+        return messages
+
+    def test_missing_token_unauthorised(self):
+        """Test that a stream cannot be opened without a token."""
+        messages: list = self.request()
+
+        self.assertEqual(messages[0]["status"], 401)
+
+    def test_stream_with_header_token(self):
+        """Test that published samples are pushed to an authenticated stream."""
+        auth: bytes = f"Token {self.token.key}".encode()
+        messages: list = self.request(headers=[(b"authorization", auth)])
+
+        self.assertEqual(messages[0]["status"], 200)
+        frames: list = [
+            m["body"] for m in messages[1:] if m["body"].startswith(b"data")
+        ]
+        self.assertEqual(decode(frames[0])["samples"], [SAMPLE])
+        self.assertEqual(self.hub.connection_count(), 0)
+
+    def test_stream_with_query_token(self):
+        """Test that `EventSource` clients can pass the token as a parameter."""
+        messages: list = self.request(query_string=f"token={self.token.key}".encode())
+
+        self.assertEqual(messages[0]["status"], 200)
+
+    def test_inactive_user_unauthorised(self):
+        """Test that tokens of deactivated users are rejected."""
+        self.user.is_active = False
+        self.user.save()
+
+        messages: list = self.request(query_string=f"token={self.token.key}".encode())
+
+        self.assertEqual(messages[0]["status"], 401)
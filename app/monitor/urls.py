@@ -0,0 +1,19 @@
+"""
+URL mapping for the monitoring API.
+"""
+from django.urls import path
+
+from monitor import views
+
+
+app_name: str = "monitor"
+
+urlpatterns: list = [
+    path("samples/", views.SampleView.as_view(), name="samples"),
+    path("alert-rules/", views.AlertRuleListView.as_view(), name="alert-rules"),
+    path(
+        "alert-rules/<int:pk>/",
+        views.AlertRuleDetailView.as_view(),
+        name="alert-rule-detail",
+    ),
+]
@@ -0,0 +1,136 @@
+"""
+Views for the monitoring API.
+"""
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext as _
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from core import cold_storage
+from core.authentication import ShardedTokenAuthentication
+from core.budgets import QueryBudget
+from core.idempotency import IdempotentPostMixin
+from core.models import AlertRule, Sample
+from monitor.ingest import ingest_samples
+from monitor.pagination import SampleCursorPagination
+from monitor.serializers import AlertRuleSerializer, SampleSerializer
+
+
+class SampleView(IdempotentPostMixin, generics.ListCreateAPIView):
+    """Ingest batches of samples and query them over a time range.
+
+    Queries return pages of samples, oldest first (see
+    `SampleCursorPagination`), so a user's whole history is never loaded at
+    once.
+
+    A batch retried with the same `Idempotency-Key` header is not ingested
+    twice.
+    """
+
+    serializer_class = SampleSerializer
+    pagination_class = SampleCursorPagination
+    authentication_classes = [ShardedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    # Authenticating takes the user's shard, unless it is cached, and the
+    # token with its user. A page then lists the partitions of the shards
+    # holding cold files in range, and fetches the hot samples; a batch is
+    # inserted, the rules of its series are fetched and updated at once,
+    # and the samples are broadcast.
+    query_budgets: dict = {
+        "GET": QueryBudget(queries=4, milliseconds=500),
+        "POST": QueryBudget(queries=6, milliseconds=1000),
+    }
+
+    def _parse_bound(self, name: str):
+        """Parse an optional ISO 8601 query parameter."""
+        raw: str = self.request.query_params.get(name)
+        if raw is None:
+            return None
+        parsed = parse_datetime(raw)
+        if parsed is None:
+            raise ValidationError({name: _("Enter a valid ISO 8601 datetime.")})
+        return parsed
+
+    def get_queryset(self):
+        """Return the samples of the authenticated user in the requested range."""
+        queryset = Sample.objects.filter(user=self.request.user)
+
+        series: str = self.request.query_params.get("series")
+        if series:
+            queryset = queryset.filter(series=series)
+        start = self._parse_bound("start")
+        if start is not None:
+            queryset = queryset.filter(timestamp__gte=start)
+        end = self._parse_bound("end")
+        if end is not None:
+            queryset = queryset.filter(timestamp__lt=end)
+
+        # Ties are ordered too, so that pages are cut consistently.
+        return queryset.order_by("timestamp", "id")
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Return a page of the samples in range from the database and cold storage."""
+        series = request.query_params.get("series") or None
+        start = self._parse_bound("start")
+        end = self._parse_bound("end")
+
+        def cold(after, limit: int) -> list:
+            """Return the cold samples of the page, which starts at `after`."""
+            if after is None or (start is not None and start > after):
+                after = start
+            return cold_storage.read_samples(request.user.id, series, after, end, limit)
+
+        samples: list = self.paginator.paginate(request, cold, self.get_queryset())
+        serializer = self.get_serializer(samples, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
+    def create(self, request: Request, *args, **kwargs) -> Response:
+        """Validate and store a batch (a JSON list) of samples."""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        samples = ingest_samples(request.user, serializer.validated_data)
+
+        return Response({"ingested": len(samples)}, status=status.HTTP_201_CREATED)
+
+
+class AlertRuleListView(generics.ListCreateAPIView):
+    """List and create alert rules of the authenticated user."""
+
+    serializer_class = AlertRuleSerializer
+    authentication_classes = [ShardedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    # Authenticating (see `SampleView`), then one query listing or creating.
+    query_budgets: dict = {
+        "GET": QueryBudget(queries=3, milliseconds=200),
+        "POST": QueryBudget(queries=3, milliseconds=200),
+    }
+
+    def get_queryset(self):
+        """Return the rules of the authenticated user."""
+        return AlertRule.objects.filter(user=self.request.user).order_by("id")
+
+    def perform_create(self, serializer: AlertRuleSerializer):
+        """Create a rule owned by the authenticated user."""
+        serializer.save(user=self.request.user)
+
+
+class AlertRuleDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Manage a single alert rule of the authenticated user."""
+
+    serializer_class = AlertRuleSerializer
+    authentication_classes = [ShardedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    # Authenticating (see `SampleView`) and fetching the rule, then updating
+    # or deleting it.
+    query_budgets: dict = {
+        "GET": QueryBudget(queries=3, milliseconds=200),
+        "PATCH": QueryBudget(queries=4, milliseconds=200),
+        "DELETE": QueryBudget(queries=4, milliseconds=200),
+    }
+
+    def get_queryset(self):
+        """Return the rules of the authenticated user."""
+        return AlertRule.objects.filter(user=self.request.user)
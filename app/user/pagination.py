@@ -0,0 +1,19 @@
+"""
+Pagination classes for the user API.
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    """Keyset pagination of users on their primary key.
+
+    Each page is fetched with `WHERE id > <last id> ORDER BY id LIMIT n`,
+    which is an index range scan, so it costs the same at any depth unlike
+    `OFFSET` pagination which reads and discards every previous row.
+    """
+
+    ordering: str = "id"
+    page_size: int = settings.USER_LIST_PAGE_SIZE
+    page_size_query_param: str = "page_size"
+    max_page_size: int = settings.USER_LIST_MAX_PAGE_SIZE
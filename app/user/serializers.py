@@ -10,6 +10,9 @@ from django.utils.translation import gettext as _
 # the rules specified and then the requested Python object or a model
 # in our database is returned.
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from core.models import UserShard
 
 
 # `ModelSerializer` allows us to automatically validate and save things
@@ -27,7 +30,12 @@ class UserSerializer(serializers.ModelSerializer):
         # `write_only` ensures that the password value is only written
         # to the database and not returned with the response. These arguments
         # must be provided as a dictionary named `extra_kwargs`.
-        extra_kwargs: dict = {"password": {"write_only": True, "min_length": 5}}
+        extra_kwargs: dict = {
+            "password": {"write_only": True, "min_length": 5},
+            # Users are spread across shards, so emails are checked against
+            # the global directory rather than the current shard.
+            "email": {"validators": [UniqueValidator(queryset=UserShard.objects.all())]},
+        }
 
     # By default, the serializer will create a default object according
     # to our model. But as we are dealing with passwords here that should
@@ -42,13 +50,37 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data: dict):
         """Update and return user."""
         password: str = validated_data.pop("password", None)
-        user = super().update(instance, validated_data)
-
+        # The password is set before the other fields are saved, so that
+        # the user is updated with a single query.
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+
+        return super().update(instance, validated_data)
+
+
+class UserListSerializer(serializers.ModelSerializer):
+    """Read-only serializer for listing users, limited to requested fields."""
+
+    class Meta:
+        model = get_user_model()
+        fields: list = [
+            "id",
+            "email",
+            "name",
+            "is_active",
+            "is_staff",
+            "is_superuser",
+            "last_login",
+        ]
+        read_only_fields: list = fields
 
-        return user
+    def __init__(self, *args, fields: list = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Drop the fields that were not requested, so that only the columns
+        # loaded with `.only()` are accessed.
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -5,14 +5,19 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.budgets import QueryBudgetTestMixin
+from user import views
+
 
 CREATE_USER_URL: str = reverse("user:create")
 TOKEN_URL: str = reverse("user:token")
 ME_URL: str = reverse("user:me")
+LIST_URL: str = reverse("user:list")
 
 
 def create_user(**kwargs):
@@ -76,6 +81,25 @@ class PublicUserAPITests(TestCase):
         )
         self.assertFalse(user_exists)
 
+    def test_create_user_retry_replayed(self):
+        """Test that a retried creation returns the original response."""
+        payload: dict = {
+            "email": "test@example.com",
+            "password": "testpass123",
+            "name": "Test User",
+        }
+        first: Response = self.client.post(
+            CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY="signup-1"
+        )
+        retry: Response = self.client.post(
+            CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY="signup-1"
+        )
+
+        # Without the key, the retry would fail as the email is taken.
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(get_user_model().objects.count(), 1)
+
     def test_create_token_for_user(self):
         """Test to check if token is created for valid credentials."""
         user_details: dict = {
@@ -184,3 +208,131 @@ class PrivateUserAPITest(TestCase):
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class ListUserAPITests(TestCase):
+    """Test the operator listing of users."""
+
+    def setUp(self):
+        self.staff = create_user(
+            email="admin@example.com", password="testpass123", is_staff=True
+        )
+        for i in range(5):
+            create_user(email=f"user{i}@example.com", is_active=i % 2 == 0)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+    def test_staff_required(self):
+        """Test that users without `is_staff` cannot list users."""
+        client = APIClient()
+        client.force_authenticate(user=create_user(email="test@example.com"))
+
+        res: Response = client.get(LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_pages_follow_cursor(self):
+        """Test that following `next` returns every user once, in id order."""
+        emails: list = []
+        url: str = f"{LIST_URL}?page_size=2"
+        while url:
+            res: Response = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data["results"]), 2)
+            emails.extend(user["email"] for user in res.data["results"])
+            url = res.data["next"]
+
+        expected: list = list(
+            get_user_model().objects.order_by("id").values_list("email", flat=True)
+        )
+        self.assertEqual(emails, expected)
+
+    def test_filters(self):
+        """Test filtering on flags and email prefix."""
+        res: Response = self.client.get(
+            LIST_URL, {"is_active": "true", "is_staff": "false", "email": "user"}
+        )
+
+        self.assertEqual(
+            [user["email"] for user in res.data["results"]],
+            ["user0@example.com", "user2@example.com", "user4@example.com"],
+        )
+
+    def test_invalid_boolean_error(self):
+        """Test that a malformed boolean filter is rejected."""
+        res: Response = self.client.get(LIST_URL, {"is_active": "maybe"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_field_selection(self):
+        """Test that only the requested fields are loaded and returned."""
+        with self.assertNumQueries(1):
+            res: Response = self.client.get(LIST_URL, {"fields": "id,email"})
+
+        self.assertEqual(set(res.data["results"][0]), {"id", "email"})
+
+    def test_unknown_field_error(self):
+        """Test that requesting a field that cannot be listed is rejected."""
+        res: Response = self.client.get(LIST_URL, {"fields": "email,password"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UserAPIBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Test that the user API stays within its query budgets."""
+
+    def setUp(self):
+        self.user = create_user(
+            email="test@example.com", password="testpass123", is_staff=True
+        )
+        for i in range(5):
+            create_user(email=f"user{i}@example.com")
+        # Authenticating with a real token, so that its query is counted.
+        self.client = APIClient()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_create_user_budget(self):
+        """Test the queries of creating a user."""
+        payload: dict = {
+            "email": "new@example.com",
+            "password": "testpass123",
+            "name": "New User",
+        }
+
+        with self.assertWithinBudget(views.CreateUserView.query_budgets["POST"]):
+            res: Response = APIClient().post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_token_budget(self):
+        """Test the queries of creating a token for a user without one."""
+        create_user(email="new@example.com", password="testpass123")
+        payload: dict = {"email": "new@example.com", "password": "testpass123"}
+
+        with self.assertWithinBudget(views.CreateTokenView.query_budgets["POST"]):
+            res: Response = APIClient().post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_manage_user_budgets(self):
+        """Test the queries of retrieving and updating the profile."""
+        budgets: dict = views.ManageUserView.query_budgets
+
+        with self.assertWithinBudget(budgets["GET"]):
+            self.client.get(ME_URL)
+        with self.assertWithinBudget(budgets["PATCH"]):
+            res: Response = self.client.patch(
+                ME_URL, {"name": "New Name", "password": "newtestpass123"}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_users_budget(self):
+        """Test that listing users takes the same queries at any depth."""
+        budget = views.ListUserView.query_budgets["GET"]
+
+        with self.assertWithinBudget(budget):
+            res: Response = self.client.get(LIST_URL, {"page_size": 2})
+        with self.assertWithinBudget(budget):
+            self.client.get(res.data["next"])
@@ -12,4 +12,5 @@ urlpatterns: list = [
     path("create/", views.CreateUserView.as_view(), name="create"),
     path("token/", views.CreateTokenView.as_view(), name="token"),
     path("me/", views.ManageUserView.as_view(), name="me"),
+    path("list/", views.ListUserView.as_view(), name="list"),
 ]
@@ -1,23 +1,50 @@
 """
 View for the user API.
 """
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.utils.translation import gettext as _
+
 # The `rest_framework` package implements a lot of the logic required
 # for adding objects to our database. Views are the ways in which
 # our request to add/modify these objects are handled. These are provided
 # by `rest_framework` in the form of base classes.
-from rest_framework import authentication, generics, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
-from user.serializers import AuthTokenSerializer, UserSerializer
+from core.authentication import ShardedTokenAuthentication, get_or_create_token
+from core.budgets import QueryBudget
+from core.idempotency import IdempotentPostMixin
+from user.pagination import UserCursorPagination
+from user.serializers import (
+    AuthTokenSerializer,
+    UserListSerializer,
+    UserSerializer,
+)
+
+# Accepted spellings of boolean query parameters.
+BOOLEANS: dict = {"true": True, "1": True, "false": False, "0": False}
 
 
 # `CreateAPIView` is designed to handle HTTP post requests for creating
 # objects.
-class CreateUserView(generics.CreateAPIView):
-    """Create a new user in the system."""
+class CreateUserView(IdempotentPostMixin, generics.CreateAPIView):
+    """Create a new user in the system.
+
+    Retries carrying the same `Idempotency-Key` header get the original
+    response back instead of hashing the password and failing again.
+    """
 
     serializer_class = UserSerializer
+    # Checking that the email is free and registering it in the directory,
+    # then inserting the user. Hashing the password takes most of the time.
+    # An `Idempotency-Key` adds a few queries to the idempotency cache.
+    query_budgets: dict = {"POST": QueryBudget(queries=3, milliseconds=1000)}
 
 
 # `ObtainAuthToken` is provided by Django for the creation of authorisation
@@ -31,15 +58,106 @@ class CreateTokenView(ObtainAuthToken):
     # `api_settings.DEFAULT_RENDERER_CLASSES` ensures that a nice, browsable
     # view of this API is rendered.
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Finding the user's shard, fetching the user, then getting or creating
+    # its token.
+    query_budgets: dict = {"POST": QueryBudget(queries=4, milliseconds=1000)}
+
+    def post(self, request: Request, *args, **kwargs) -> Response:
+        """Return the token of the user, created on its shard if needed."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data["user"]
+        token = get_or_create_token(user)
+        # Updates `last_login`, buffered by `core.last_seen` instead of
+        # written by this request.
+        user_logged_in.send(sender=type(user), request=request, user=user)
+
+        return Response({"token": token.key})
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
 
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [ShardedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    # The token is fetched along with its user in one query, after finding
+    # the user's shard unless it is cached.
+    query_budgets: dict = {
+        "GET": QueryBudget(queries=2, milliseconds=200),
+        "PATCH": QueryBudget(queries=3, milliseconds=1000),
+    }
 
     def get_object(self):
         """Retrieve and return the authenticated object."""
         return self.request.user
+
+
+class ListUserView(generics.ListAPIView):
+    """List users for operators, one keyset-paginated page at a time.
+
+    Supported query parameters:
+    - `is_active`, `is_staff`: `true` or `false`;
+    - `email`: a case-sensitive prefix of the email address;
+    - `fields`: comma-separated fields to return, by default all of them;
+    - `cursor`, `page_size`: see `UserCursorPagination`;
+    - `shard`: the shard to list, by default the first one. Pages are
+      only consistent within one shard, so operators list each in turn.
+    """
+
+    serializer_class = UserListSerializer
+    pagination_class = UserCursorPagination
+    authentication_classes = [ShardedTokenAuthentication]
+    # `IsAdminUser` only lets users with `is_staff` in.
+    permission_classes = [permissions.IsAdminUser]
+    # Authenticating, then fetching one page whatever its size and depth.
+    query_budgets: dict = {"GET": QueryBudget(queries=3, milliseconds=200)}
+
+    def _parse_boolean(self, name: str):
+        """Parse an optional boolean query parameter."""
+        raw: str = self.request.query_params.get(name)
+        if raw is None:
+            return None
+        if raw.lower() not in BOOLEANS:
+            raise ValidationError({name: _("Enter either true or false.")})
+        return BOOLEANS[raw.lower()]
+
+    def _requested_fields(self):
+        """Return the requested fields, or `None` if all are requested."""
+        raw: str = self.request.query_params.get("fields")
+        if not raw:
+            return None
+        fields: list = [name.strip() for name in raw.split(",") if name.strip()]
+        unknown: list = sorted(set(fields) - set(UserListSerializer.Meta.fields))
+        if unknown:
+            raise ValidationError(
+                {"fields": _("Unknown fields: %s.") % ", ".join(unknown)}
+            )
+        return fields
+
+    def get_queryset(self):
+        """Return the users matching the filters, loading only requested fields."""
+        shard: str = self.request.query_params.get("shard", settings.SHARDS[0])
+        if shard not in settings.SHARDS:
+            raise ValidationError({"shard": _("Unknown shard.")})
+        queryset = get_user_model().objects.using(shard)
+
+        for name in ("is_active", "is_staff"):
+            value = self._parse_boolean(name)
+            if value is not None:
+                queryset = queryset.filter(**{name: value})
+        email: str = self.request.query_params.get("email")
+        if email:
+            queryset = queryset.filter(email__startswith=email)
+
+        fields = self._requested_fields()
+        if fields is not None:
+            # `id` is always loaded, as the pagination cursor is built from it.
+            queryset = queryset.only(*fields)
+
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        """Return a serializer limited to the requested fields."""
+        kwargs.setdefault("fields", self._requested_fields())
+        return super().get_serializer(*args, **kwargs)